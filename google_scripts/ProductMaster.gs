@@ -0,0 +1,37 @@
+// ============================
+// ProductMaster.gs
+// - Barcode lookup over the columnar product master (docs/uk/data/pc_master.json)
+// - Paste that file into ProductMasterData.gs as:  const PRODUCT_MASTER = { ...json... };
+// - Columns are barcode-sorted -> binary search, no per-row objects built up front
+// ============================
+
+function findProductIndex_(barcode) {
+  const codes = PRODUCT_MASTER.columns.barcode;
+  const key = String(barcode ?? "").trim();
+  let lo = 0;
+  let hi = codes.length - 1;
+  while (lo <= hi) {
+    const mid = (lo + hi) >> 1;
+    const c = codes[mid];
+    if (c === key) return mid;
+    if (c < key) lo = mid + 1;
+    else hi = mid - 1;
+  }
+  return -1;
+}
+
+// Returns { Barcode, Brand, Description, ImageUrl, PiecePriceGBP, InnerCase } or null
+function findProduct_(barcode) {
+  const i = findProductIndex_(barcode);
+  if (i < 0) return null;
+
+  const col = PRODUCT_MASTER.columns;
+  return {
+    Barcode: col.barcode[i],
+    Brand: PRODUCT_MASTER.brands[col.brand[i]] || "",
+    Description: String(col.description[i] ?? ""),
+    ImageUrl: String(col.imageUrl[i] ?? ""),
+    PiecePriceGBP: Number(col.piecePriceGBP[i] ?? 0),
+    InnerCase: Number(col.innerCase[i] ?? 0)
+  };
+}
@@ -0,0 +1,108 @@
+import json
+import random
+import threading
+import time
+from collections import deque
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+
+class FakeDrive:
+    """
+    Local stand-in for the Drive v3 client: service.files().create(...).execute().
+    - latency_ms (+/- jitter_ms) per call, plus transfer time at bandwidth_mbps
+    - qps_limit: more than this many creates in any 1s window -> 403 rateLimitExceeded
+    - error_rate: share of calls failing with a 503
+    Thread-safe; counts calls, bytes and injected errors.
+    """
+
+    def __init__(self, latency_ms=80.0, jitter_ms=20.0, bandwidth_mbps=0.0, qps_limit=0,
+                 error_rate=0.0, seed=1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.bandwidth_mbps = bandwidth_mbps
+        self.qps_limit = qps_limit
+        self.error_rate = error_rate
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self.calls = 0
+        self.created = 0
+        self.bytes = 0
+        self.rate_limited = 0
+        self.errors = 0
+
+    def files(self):
+        return self
+
+    def create(self, body=None, media_body=None, fields=None, **kwargs):
+        return _CreateRequest(self, media_body)
+
+    def _execute_create(self, media_body):
+        size = media_body.size() if media_body is not None else 0
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            throttled = bool(self.qps_limit) and len(self._recent) >= self.qps_limit
+            self._recent.append(now)
+            failed = not throttled and self._rng.random() < self.error_rate
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            if self.bandwidth_mbps:
+                delay += size * 8 / (self.bandwidth_mbps * 1_000_000)
+
+        if throttled:
+            time.sleep(delay / 4)
+            with self._lock:
+                self.rate_limited += 1
+            raise _http_error(403, "rateLimitExceeded", "User rate limit exceeded.")
+        time.sleep(delay)
+        if failed:
+            with self._lock:
+                self.errors += 1
+            raise _http_error(503, "backendError", "Backend Error")
+
+        with self._lock:
+            self.created += 1
+            self.bytes += size
+            file_id = f"fake{self.created:07d}"
+        return {"id": file_id}
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "created": self.created,
+            "bytes": self.bytes,
+            "rateLimited": self.rate_limited,
+            "errors": self.errors,
+        }
+
+
+class _CreateRequest:
+    def __init__(self, drive, media_body):
+        self._drive = drive
+        self._media_body = media_body
+
+    def execute(self, num_retries=0):
+        return self._drive._execute_create(self._media_body)
+
+
+def _http_error(status: int, reason: str, message: str) -> HttpError:
+    content = json.dumps({"error": {"code": status, "message": message, "errors": [{"reason": reason}]}})
+    return HttpError(httplib2.Response({"status": status}), content.encode("utf-8"))
+
+
+class FakeClientPool:
+    """Drop-in for drive_clients.DriveClientPool that hands out one shared FakeDrive."""
+
+    def __init__(self, drive: FakeDrive):
+        self.drive = drive
+        self.builds = 0
+        self.build_seconds = 0.0
+        self.refreshes = 0
+
+    def service(self):
+        return self.drive
@@ -0,0 +1,91 @@
+import io
+import os
+import sys
+import argparse
+
+import openpyxl
+from openpyxl.drawing.image import Image as XLImage
+from PIL import Image, ImageDraw
+
+
+HEADER_ROW = 4
+IMAGE_COLUMN_INDEX = 14  # N, same as the exporter default
+HEADERS = ["Product Code", "Barcode", "Case Size", "Name", "Price", "Country of Origin", "Brand"]
+BRANDS = ["AUSSIE", "DOVE", "NIVEA", "PANTENE", "SURE", "LYNX", "RIMMEL", "COLGATE", "SIMPLE", "TRESEMME"]
+SIZES = ["50ML", "150ML", "250ML", "350ML", "400ML", "500ML"]
+KINDS = ["SHAMPOO", "CONDITIONER", "SHOWER GEL", "BODY LOTION", "DEODORANT", "TOOTHPASTE"]
+
+
+def _image_bytes(base: Image.Image, i: int, fmt: str) -> bytes:
+    """Unique image per row: the shared noise base plus a row-specific mark."""
+    im = base.copy()
+    draw = ImageDraw.Draw(im)
+    draw.rectangle((0, 0, 40, 40), fill=(i * 37 % 256, i * 71 % 256, i * 13 % 256))
+    draw.text((4, 48), str(i), fill=(255, 255, 255))
+    out = io.BytesIO()
+    if fmt == "JPEG":
+        im.save(out, fmt, quality=85)
+    else:
+        im.save(out, fmt)
+    return out.getvalue()
+
+
+def make_workbook(path: str, rows: int, images: int = None, image_edge: int = 600, image_format: str = "JPEG",
+                  sheet_title: str = "18.2.2026"):
+    """
+    Write a supplier-style workbook: title in row 1, headers in HEADER_ROW, `rows` products
+    and `images` embedded pictures (default: one per row) spread evenly over the rows in
+    IMAGE_COLUMN_INDEX. Images are noise-based so they compress like product photos.
+    """
+    images = rows if images is None else min(images, rows)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = sheet_title
+    ws.cell(1, 1, "PC supplier list (synthetic)")
+
+    for c, h in enumerate(HEADERS, start=1):
+        ws.cell(HEADER_ROW, c, h)
+    ws.cell(HEADER_ROW, IMAGE_COLUMN_INDEX, "Image")
+
+    noise = Image.effect_noise((image_edge, image_edge), 48)
+    base = Image.merge("RGB", (noise, noise.rotate(90), noise.rotate(180)))
+
+    for i in range(rows):
+        r = HEADER_ROW + 1 + i
+        brand = BRANDS[i % len(BRANDS)]
+        values = [
+            f"PC{i:06d}",
+            str(5000000000000 + i * 7),
+            (6, 12, 24)[i % 3],
+            f"{brand} {SIZES[i % len(SIZES)]} {KINDS[(i // 3) % len(KINDS)]}",
+            round(0.5 + (i % 400) * 0.05, 2),
+            "UK",
+            brand,
+        ]
+        for c, v in enumerate(values, start=1):
+            ws.cell(r, c, v)
+
+        if (i * images) // rows != ((i + 1) * images) // rows:
+            img = XLImage(io.BytesIO(_image_bytes(base, i, image_format)))
+            ws.add_image(img, f"{openpyxl.utils.get_column_letter(IMAGE_COLUMN_INDEX)}{r}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    wb.save(path)
+    return path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate a synthetic PC supplier workbook.")
+    ap.add_argument("out", help="output .xlsx path")
+    ap.add_argument("--rows", type=int, default=1000)
+    ap.add_argument("--images", type=int, default=None, help="embedded images (default: one per row)")
+    ap.add_argument("--image-edge", type=int, default=600, help="image width/height in px")
+    ap.add_argument("--image-format", choices=["JPEG", "PNG"], default="JPEG")
+    args = ap.parse_args(argv)
+
+    make_workbook(args.out, args.rows, args.images, args.image_edge, args.image_format)
+    print(f"✅ Wrote {args.out} ({os.path.getsize(args.out) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import shutil
+import subprocess
+import contextlib
+import zipfile
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))  # python/pc: the exporter modules
+
+import export_pc_data as exporter  # noqa: E402
+from fake_drive import FakeClientPool, FakeDrive  # noqa: E402
+from image_normalize import normalize_image  # noqa: E402
+from make_workbook import HEADER_ROW, IMAGE_COLUMN_INDEX, make_workbook  # noqa: E402
+from upload_scheduler import AdaptiveUploader  # noqa: E402
+from xlsx_images import column_media_by_row, find_image_anchors, media_ext, read_media, resolve_sheet_path  # noqa: E402
+
+
+CACHE_DIR = os.path.join(BENCH_DIR, ".cache")
+DEFAULT_RESULTS = os.path.join(CACHE_DIR, "results.jsonl")  # local history, not committed
+
+# A phase this much slower than the previous run with the same settings is flagged
+REGRESSION_THRESHOLD = 1.20
+
+
+def git_rev() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def workbook_for(rows: int, images: int, image_edge: int) -> str:
+    """Generated workbooks are cached by size, generation is not part of the timings."""
+    path = os.path.join(CACHE_DIR, f"wb-{rows}-{images}-{image_edge}.xlsx")
+    if not os.path.exists(path):
+        exporter.log(f"🧪 Generating {os.path.basename(path)}...")
+        make_workbook(path, rows, images, image_edge)
+    return path
+
+
+class Timer:
+    def __init__(self):
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - start, 4)
+
+
+def bench_phases(xlsx: str, work_dir: str, args) -> dict:
+    """Time each exporter phase on its own, with the exporter's own functions."""
+    t = Timer()
+
+    with t.phase("load"):
+        wb = exporter.open_workbook_streaming(xlsx)
+        ws = wb[wb.sheetnames[0]]
+        headers = exporter.read_headers(ws, HEADER_ROW)
+
+    with t.phase("rows"):
+        products_by_row = dict(exporter.iter_product_rows(ws, headers, HEADER_ROW + 1))
+    wb.close()
+
+    with t.phase("extract"):
+        with zipfile.ZipFile(xlsx) as zf:
+            _, sheet_path = resolve_sheet_path(zf)
+            media_by_row = column_media_by_row(find_image_anchors(zf, sheet_path), IMAGE_COLUMN_INDEX)
+            images = {row: (media_ext(path), read_media(zf, path)) for row, path in media_by_row.items()}
+    image_bytes = sum(len(data) for _, data in images.values())
+
+    if args.normalize:
+        with t.phase("normalize"):
+            rows = list(images)
+            with ProcessPoolExecutor(max_workers=args.normalize_workers) as pool:
+                results = pool.map(
+                    normalize_image,
+                    [images[r][1] for r in rows],
+                    [images[r][0] for r in rows],
+                    chunksize=8,
+                )
+                images = dict(zip(rows, results))
+
+    with t.phase("save"):
+        img_dir = os.path.join(work_dir, "images")
+        os.makedirs(img_dir, exist_ok=True)
+        for row, (ext, data) in images.items():
+            with open(os.path.join(img_dir, f"row{row}.{ext}"), "wb") as f:
+                f.write(data)
+
+    drive = FakeDrive(args.latency_ms, args.jitter_ms, args.bandwidth_mbps, args.qps_limit, args.error_rate)
+    urls = {}
+
+    def upload_one(item):
+        row, filename, data = item
+        return exporter.upload_bytes_to_drive(drive, data, filename, "bench-folder")
+
+    def on_result(item, result, error):
+        if error is None:
+            urls[item[0]] = result[1]
+
+    uploader = AdaptiveUploader(upload_one, start_workers=args.start_workers, max_workers=args.max_workers,
+                                base_delay=0.05, max_delay=1.0)
+    with t.phase("upload"):
+        uploader.run([(row, f"row{row}.{ext}", data) for row, (ext, data) in images.items()], on_result)
+
+    with t.phase("json"):
+        products = []
+        for row, obj in products_by_row.items():
+            out = dict(obj)
+            out["imageUrl"] = urls.get(row)
+            products.append(out)
+        with open(os.path.join(work_dir, "pc_data.json"), "w", encoding="utf-8") as f:
+            json.dump({"meta": {"count": len(products)}, "products": products}, f, ensure_ascii=False, indent=2)
+
+    return {
+        "products": len(products_by_row),
+        "images": len(images),
+        "imageBytes": image_bytes,
+        "phases": t.phases,
+        "upload": uploader.stats(),
+        "fakeDrive": drive.stats(),
+    }
+
+
+@contextlib.contextmanager
+def fake_drive_login(drive: FakeDrive):
+    """Make export_pc_data use the fake Drive instead of OAuth + real clients."""
+    saved = {}
+    patches = {
+        "get_oauth_credentials": lambda: None,
+        "DriveClientPool": lambda creds: FakeClientPool(drive),
+    }
+    for name, value in patches.items():
+        saved[name] = getattr(exporter, name)
+        setattr(exporter, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(exporter, name, value)
+
+
+def bench_end_to_end(xlsx: str, work_dir: str, args) -> dict:
+    """Full export_workbook() run (pipeline, manifest, side artifacts), log output discarded."""
+    drive = FakeDrive(args.latency_ms, args.jitter_ms, args.bandwidth_mbps, args.qps_limit, args.error_rate)
+    out_dir = os.path.join(work_dir, "export")
+    shutil.rmtree(out_dir, ignore_errors=True)  # cold run: no snapshot, no upload manifest
+    os.makedirs(out_dir)
+
+    cfg = exporter.default_config()
+    cfg.update({
+        "EXCEL_PATH": xlsx,
+        "OUT_JSON_PATH": os.path.join(out_dir, "pc_data.json"),
+        "OUT_IMAGES_DIR": os.path.join(out_dir, "images"),
+        "OUT_SHARDS_DIR": os.path.join(out_dir, "shards"),
+        "UPLOAD_MANIFEST_PATH": os.path.join(out_dir, "upload_manifest.json"),
+        "UPLOAD_JOURNAL_DIR": os.path.join(out_dir, "journal"),
+        "OUT_DB_PATH": os.path.join(out_dir, "pc_catalogue.sqlite3"),
+        "METRICS_PATH": os.path.join(out_dir, "metrics.jsonl"),
+        "HEADER_ROW": HEADER_ROW,
+        "IMAGE_COLUMN_INDEX": IMAGE_COLUMN_INDEX,
+        "NORMALIZE_IMAGES": args.normalize,
+        "NORMALIZE_WORKERS": args.normalize_workers,
+        # every generated image is a distinct product on the same noise base: measure
+        # one upload per image rather than near-duplicate matching
+        "NEAR_DUPLICATE_DISTANCE": None,
+        # side artifacts are opt-in in the exporter: measure them as before
+        "WRITE_SHARDS": True,
+        "WRITE_SEARCH_INDEX": True,
+        "WRITE_PRODUCT_MASTER": True,
+        "WRITE_CATALOGUE_DB": True,
+        "UPLOAD_START_WORKERS": args.start_workers,
+        "UPLOAD_MAX_WORKERS": args.max_workers,
+    })
+    with fake_drive_login(drive), open(os.devnull, "w") as devnull:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(devnull):
+            exporter.export_workbook(cfg)
+        seconds = time.perf_counter() - start
+    return {"seconds": round(seconds, 4), "fakeDrive": drive.stats()}
+
+
+def previous_record(path: str, settings: dict):
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get("settings") == settings:
+                last = rec
+    return last
+
+
+def compare(prev: dict, cur: dict) -> list:
+    """Phases that got slower than REGRESSION_THRESHOLD x the previous run, per scale."""
+    prev_by_rows = {s["rows"]: s for s in prev["scales"]}
+    slower = []
+    for s in cur["scales"]:
+        p = prev_by_rows.get(s["rows"])
+        if not p:
+            continue
+        timings = dict(s["phases"], endToEnd=s["endToEnd"]["seconds"])
+        before = dict(p["phases"], endToEnd=p["endToEnd"]["seconds"])
+        for name, sec in timings.items():
+            if sec is None or before.get(name) is None:
+                continue
+            # ignore sub-10ms phases, their noise is bigger than any real change
+            if sec >= 0.01 and sec > REGRESSION_THRESHOLD * before[name]:
+                slower.append((s["rows"], name, before[name], sec))
+    return slower
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark export_pc_data.py phases on synthetic workbooks.")
+    ap.add_argument("--scales", default="100,500,2000", help="comma-separated row counts")
+    ap.add_argument("--image-ratio", type=float, default=0.9, help="share of rows with an embedded image")
+    ap.add_argument("--image-edge", type=int, default=600, help="generated image size in px")
+    ap.add_argument("--no-normalize", dest="normalize", action="store_false", help="skip the normalize phase")
+    ap.add_argument("--normalize-workers", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--latency-ms", type=float, default=80.0, help="fake Drive latency per create")
+    ap.add_argument("--jitter-ms", type=float, default=20.0)
+    ap.add_argument("--bandwidth-mbps", type=float, default=0.0, help="0 = unlimited")
+    ap.add_argument("--qps-limit", type=int, default=0, help="fake Drive rate limit (creates/s), 0 = off")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of creates failing with 503")
+    ap.add_argument("--start-workers", type=int, default=6)
+    ap.add_argument("--max-workers", type=int, default=16)
+    ap.add_argument("--skip-end-to-end", action="store_true", help="only time the phases")
+    ap.add_argument("--results", default=DEFAULT_RESULTS, help="JSON-lines file the run is appended to")
+    args = ap.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    settings = {k: v for k, v in vars(args).items() if k not in ("scales", "results", "skip_end_to_end")}
+
+    record = {
+        "generatedAt": datetime.utcnow().isoformat() + "Z",
+        "gitRev": git_rev(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "settings": settings,
+        "scales": [],
+    }
+
+    for rows in scales:
+        images = int(rows * args.image_ratio)
+        xlsx = workbook_for(rows, images, args.image_edge)
+        work_dir = os.path.join(CACHE_DIR, "run", str(rows))
+        exporter.log(f"⏱️ {rows} rows / {images} images ({os.path.getsize(xlsx) / 1024 / 1024:.1f} MB)...")
+
+        result = {"rows": rows, "workbookBytes": os.path.getsize(xlsx)}
+        result.update(bench_phases(xlsx, work_dir, args))
+        result["endToEnd"] = {"seconds": None} if args.skip_end_to_end else bench_end_to_end(xlsx, work_dir, args)
+        record["scales"].append(result)
+
+        phases = "  ".join(f"{k}={v:.3f}s" for k, v in result["phases"].items())
+        e2e = result["endToEnd"]["seconds"]
+        exporter.log(f"   {phases}" + (f"  end-to-end={e2e:.3f}s" if e2e is not None else ""))
+        exporter.log(f"   upload: {result['upload']}")
+
+    prev = previous_record(args.results, settings)
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    exporter.log(f"🧾 Results appended to {args.results}")
+
+    if prev:
+        slower = compare(prev, record)
+        if slower:
+            exporter.log(f"⚠️ Slower than the previous run ({prev.get('gitRev')}):")
+            for rows, name, before, now in slower:
+                exporter.log(f"   {rows} rows {name}: {before:.3f}s -> {now:.3f}s")
+            return 1
+        exporter.log(f"✅ No phase more than {int(100 * (REGRESSION_THRESHOLD - 1))}% slower than {prev.get('gitRev')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import os
+import re
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+
+from product_record import json_default
+from search_index import barcode_key
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL UNIQUE,
+    generated_at TEXT NOT NULL,
+    source_file TEXT NOT NULL,
+    sheet TEXT,
+    price_list_date TEXT,
+    product_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS products (
+    product_id TEXT PRIMARY KEY,
+    barcode TEXT,
+    brand TEXT,
+    name TEXT,
+    case_size TEXT,
+    price REAL,
+    image_url TEXT,
+    data TEXT NOT NULL,
+    first_run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    last_run_id INTEGER NOT NULL REFERENCES runs(run_id)
+);
+CREATE INDEX IF NOT EXISTS products_barcode ON products(barcode);
+CREATE INDEX IF NOT EXISTS products_brand ON products(brand COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS price_history (
+    product_id TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    price REAL,
+    PRIMARY KEY (product_id, run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS price_history_run ON price_history(run_id);
+"""
+
+# products column -> product field (normalized header), as in product_master.MASTER_COLUMNS
+PRODUCT_COLUMNS = {
+    "barcode": "barcode",
+    "brand": "brand",
+    "name": "name",
+    "case_size": "case_size",
+    "price": "price",
+}
+
+# Price lists are ordered by their sheet date, runs without one by export time
+RUN_ORDER = "(SELECT COALESCE(price_list_date, generated_at) FROM runs WHERE run_id = {})"
+
+BUSY_TIMEOUT_SECONDS = 60  # batch workers write one database
+
+
+def parse_price(value):
+    """'£1.25', '1,250.00', 1.25 -> float; anything else -> None."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = re.sub(r"[^\d.\-]", "", str(value or ""))
+    try:
+        return float(text) if text else None
+    except ValueError:
+        return None
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open (and create if needed) the catalogue database."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def run_fingerprint(meta: dict, prices: list) -> str:
+    """Same workbook + sheet with the same products and prices = same run (no new price history)."""
+    h = hashlib.sha256(f"{meta['sourceFile']}\0{meta.get('sheet')}".encode("utf-8"))
+    for product_id, price in prices:
+        h.update(f"\0{product_id}\0{price}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def product_rows(products, field_names: dict):
+    """products table rows (without the run ids); a repeated product_id keeps its first row."""
+    seen = set()
+    for p in products:
+        product_id = p.get("product_id")
+        if not product_id or product_id in seen:
+            continue
+        seen.add(product_id)
+        values = {}
+        for column, field in PRODUCT_COLUMNS.items():
+            header = field_names.get(field)
+            values[column] = p.get(header) if header else None
+        yield (
+            product_id,
+            barcode_key(values["barcode"]) or None,
+            str(values["brand"] or "").strip() or None,
+            values["name"],
+            None if values["case_size"] is None else str(values["case_size"]),
+            parse_price(values["price"]),
+            p.get("imageUrl"),
+            json.dumps(p, ensure_ascii=False, separators=(",", ":"), default=json_default),
+        )
+
+
+def record_run(conn: sqlite3.Connection, products, field_names: dict, meta: dict,
+               price_list_date: str = None):
+    """
+    Upsert every product (keyed by product_id) and append one price_history row per
+    product for this run, in one transaction. field_names maps PRODUCT_COLUMNS values
+    to the header names in the rows (None = missing). Returns (run_id, added): added is
+    False when the same price list was already recorded; its products are still
+    upserted (image URLs or names may have changed), its price history is not repeated.
+    products is read twice (e.g. a snapshot_writer.SnapshotProducts): once for the
+    prices, once streaming the upserts, so only ids and prices are held.
+    """
+    prices = [(row[0], row[5]) for row in product_rows(products, field_names)]
+
+    fingerprint = run_fingerprint(meta, prices)
+    with conn:
+        found = conn.execute("SELECT run_id FROM runs WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if found:
+            run_id = found[0]
+        else:
+            run_id = conn.execute(
+                "INSERT INTO runs (fingerprint, generated_at, source_file, sheet, price_list_date, product_count) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (fingerprint, meta["generatedAt"], meta["sourceFile"], meta.get("sheet"), price_list_date, len(prices)),
+            ).lastrowid
+        conn.executemany(
+            "INSERT INTO products (product_id, barcode, brand, name, case_size, price, image_url, data, "
+            "first_run_id, last_run_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(product_id) DO UPDATE SET barcode = excluded.barcode, brand = excluded.brand, "
+            "name = excluded.name, case_size = excluded.case_size, price = excluded.price, "
+            "image_url = excluded.image_url, data = excluded.data, last_run_id = excluded.last_run_id "
+            # an older price list recorded late (batch order, re-export) does not overwrite newer data
+            f"WHERE {RUN_ORDER.format('excluded.last_run_id')} >= {RUN_ORDER.format('products.last_run_id')}",
+            (row + (run_id, run_id) for row in product_rows(products, field_names)),
+        )
+        if not found:
+            conn.executemany(
+                "INSERT INTO price_history (product_id, run_id, price) VALUES (?, ?, ?)",
+                [(product_id, run_id, price) for product_id, price in prices],
+            )
+    return run_id, not found
+
+
+def price_history(conn: sqlite3.Connection, barcode: str = None, brand: str = None, limit: int = 50) -> list:
+    """Prices per price list, newest first, for one barcode and/or brand (index lookups)."""
+    where, params = [], []
+    if barcode:
+        where.append("p.barcode = ?")
+        params.append(barcode_key(barcode))
+    if brand:
+        where.append("p.brand = ? COLLATE NOCASE")
+        params.append(brand)
+    if not where:
+        raise ValueError("price_history needs a barcode or a brand")
+    sql = (
+        "SELECT p.barcode, p.brand, p.name, r.price_list_date, r.sheet, r.source_file, h.price "
+        "FROM products p JOIN price_history h ON h.product_id = p.product_id "
+        "JOIN runs r ON r.run_id = h.run_id "
+        f"WHERE {' AND '.join(where)} "
+        "ORDER BY COALESCE(r.price_list_date, r.generated_at) DESC, r.run_id DESC, p.barcode LIMIT ?"
+    )
+    return conn.execute(sql, params + [limit]).fetchall()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Price history from the PC catalogue database")
+    ap.add_argument("db", help="catalogue database (OUT_DB_PATH of the exporter)")
+    ap.add_argument("--barcode")
+    ap.add_argument("--brand")
+    ap.add_argument("--limit", type=int, default=50)
+    args = ap.parse_args(argv)
+    if not (args.barcode or args.brand):
+        ap.error("give --barcode and/or --brand")
+
+    conn = connect(args.db)
+    try:
+        for barcode, brand, name, date, sheet, source, price in price_history(
+            conn, args.barcode, args.brand, args.limit
+        ):
+            print(f"{date or sheet or '-':<10}  {barcode or '-':<14}  {price if price is not None else '-':>8}  "
+                  f"{brand or ''} {name or ''}  ({source})")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+import tempfile
+from datetime import datetime
+
+from product_record import json_default
+
+try:
+    import brotli  # in requirements.txt; without it only .gz siblings are written
+except ImportError:
+    brotli = None
+
+
+MANIFEST_NAME = "index.json"
+
+
+def shard_slug(value) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", str(value or "").strip().lower()).strip("-")
+    return slug or "unbranded"
+
+
+def spool_groups(products, spool, shard_by: str, brand_field: str = None, page_size: int = 250):
+    """
+    Split products into shards, keeping catalogue order inside each shard, with each
+    product's compact JSON written to spool (a binary file) instead of kept in memory.
+    shard_by="brand" groups by the brand column (falls back to pages if there is none);
+    shard_by="page" makes fixed-size pages. Returns ({key: [(offset, length), ...]},
+    {key: brand names}, product count).
+    """
+    groups = {}
+    brands = {}
+    by_brand = shard_by == "brand" and brand_field
+    count = 0
+    for p in products:
+        data = json.dumps(p, ensure_ascii=False, separators=(",", ":"), default=json_default).encode("utf-8")
+        if by_brand:
+            key = shard_slug(p.get(brand_field))
+            brands.setdefault(key, set()).add(str(p.get(brand_field) or "").strip())
+        else:
+            key = f"page-{count // page_size + 1:04d}"
+        groups.setdefault(key, []).append((spool.tell(), len(data)))
+        spool.write(data)
+        count += 1
+    return groups, brands, count
+
+
+def _write_if_missing(path: str, data: bytes):
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+def _write_groups(spool, groups: dict, brands: dict, out_dir: str):
+    """Write the spooled shards (see spool_groups); returns (manifest entries, file names written)."""
+    shards = []
+    keep = {MANIFEST_NAME}
+    for key, spans in groups.items():
+        items = []
+        for offset, length in spans:
+            spool.seek(offset)
+            items.append(spool.read(length))
+        # same bytes as json.dumps(shard, separators=(",", ":"))
+        raw = b"[" + b",".join(items) + b"]"
+        digest = hashlib.sha256(raw).hexdigest()
+        filename = f"{key}.{digest[:12]}.json"
+        path = os.path.join(out_dir, filename)
+
+        _write_if_missing(path, raw)
+        keep.add(filename)
+
+        gz_path = f"{path}.gz"
+        # mtime=0 -> byte-identical .gz for identical content
+        _write_if_missing(gz_path, gzip.compress(raw, compresslevel=9, mtime=0))
+        keep.add(f"{filename}.gz")
+
+        entry = {
+            "key": key,
+            "file": filename,
+            "count": len(spans),
+            "sha256": digest,
+            "bytes": len(raw),
+            "gzBytes": os.path.getsize(gz_path),
+        }
+        if brotli is not None:
+            br_path = f"{path}.br"
+            _write_if_missing(br_path, brotli.compress(raw, quality=11))
+            keep.add(f"{filename}.br")
+            entry["brBytes"] = os.path.getsize(br_path)
+        if key in brands:
+            entry["brands"] = sorted(brands[key])
+        shards.append(entry)
+    return shards, keep
+
+
+def write_shards(products, out_dir: str, meta: dict, shard_by: str = "brand",
+                 brand_field: str = None, page_size: int = 250) -> dict:
+    """
+    Write compact JSON shards named <key>.<hash>.json plus .gz/.br siblings and an
+    index.json manifest listing every shard with its count and sha256.
+    A shard whose content did not change keeps its file name, so browser caches stay
+    valid; shard files no longer referenced by the manifest are removed.
+    products is read once; only one shard is in memory at a time. Returns the manifest.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with tempfile.TemporaryFile(dir=out_dir) as spool:
+        groups, brands, count = spool_groups(products, spool, shard_by, brand_field, page_size)
+        shards, keep = _write_groups(spool, groups, brands, out_dir)
+    effective_by = "brand" if shard_by == "brand" and brand_field else "page"
+
+    for name in os.listdir(out_dir):
+        if name not in keep and re.search(r"\.[0-9a-f]{12}\.json(\.gz|\.br)?$", name):
+            os.remove(os.path.join(out_dir, name))
+
+    manifest = {
+        "generatedAt": datetime.utcnow().isoformat() + "Z",
+        "sourceFile": meta.get("sourceFile"),
+        "sheet": meta.get("sheet"),
+        "shardBy": effective_by,
+        "count": count,
+        "encodings": ["gzip", "br"] if brotli is not None else ["gzip"],
+        "shards": shards,
+    }
+    tmp_path = os.path.join(out_dir, f"{MANIFEST_NAME}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_NAME))
+    return manifest
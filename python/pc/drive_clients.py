@@ -0,0 +1,75 @@
+import time
+import threading
+
+import httplib2
+import google_auth_httplib2
+from google.auth import credentials as ga_credentials
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build
+
+
+HTTP_TIMEOUT_SECONDS = 120
+
+
+class _SharedTokenCredentials(ga_credentials.Credentials):
+    """
+    Per-thread credentials view over one shared OAuth token.
+    Refresh is delegated to the pool, so an expired token is refreshed once for all
+    workers instead of once per worker.
+    """
+
+    def __init__(self, pool):
+        super().__init__()
+        self._pool = pool
+        self.token, self.expiry = pool.current_token()
+
+    def refresh(self, request):
+        self.token, self.expiry = self._pool.refresh_token(stale_token=self.token)
+
+
+class DriveClientPool:
+    """
+    One Drive client per worker thread, built once and reused for every upload.
+    - static (bundled) discovery document: no discovery fetch
+    - one persistent httplib2 connection per thread (keep-alive)
+    - token refresh coordinated across threads with a lock
+    """
+
+    def __init__(self, creds):
+        self._creds = creds
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.builds = 0
+        self.build_seconds = 0.0
+        self.refreshes = 0
+
+    def current_token(self):
+        with self._lock:
+            if not self._creds.valid:
+                self._refresh_locked()
+            return self._creds.token, self._creds.expiry
+
+    def refresh_token(self, stale_token: str):
+        """Refresh unless another worker already replaced stale_token."""
+        with self._lock:
+            if self._creds.token == stale_token or not self._creds.valid:
+                self._refresh_locked()
+            return self._creds.token, self._creds.expiry
+
+    def _refresh_locked(self):
+        self._creds.refresh(Request())
+        self.refreshes += 1
+
+    def service(self):
+        """Drive client for the calling thread (built on first use)."""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            start = time.perf_counter()
+            creds = _SharedTokenCredentials(self)
+            http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+            service = build("drive", "v3", http=http, static_discovery=True, cache_discovery=False)
+            self._local.service = service
+            with self._lock:
+                self.builds += 1
+                self.build_seconds += time.perf_counter() - start
+        return service
@@ -1,34 +1,98 @@
+import io
 import os
 import re
+import sys
+import argparse
+import multiprocessing
+import mimetypes
 import json
 import time
+import zipfile
+import threading
+import uuid
 from collections import defaultdict
+from contextlib import nullcontext
+from functools import partial
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
 
 import openpyxl
 
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaIoBaseUpload
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 
+import catalogue_db
+import incremental
+from metrics import PROFILE_ENV, RunMetrics, append_jsonl, profiling
+import search_index
+import shared_uploads
+import static_images
+from snapshot_writer import SnapshotWriter
+from drive_clients import DriveClientPool
+from catalogue_shards import write_shards
+from product_record import ProductRecord, RecordSchema
+from product_master import build_master, write_master
+from image_dedup import NearDuplicateIndex, dhash_bytes, dhash_hex, hamming, normalize_and_dhash
+from image_normalize import profile_tag
+from pipeline import MonitoredQueue, Stage, StageStats, format_pipeline_report, iter_queue, join_all
+from upload_scheduler import AdaptiveUploader
+import upload_journal
+import upload_manifest
+from xlsx_images import (
+    column_media_by_row,
+    find_image_anchors,
+    media_ext,
+    media_signature,
+    read_media,
+    resolve_sheet_path,
+)
+
 
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 DEFAULT_XLSX = os.path.join(ROOT_DIR, "python", "pc", "data_file", "pc_data.xlsx")
 DEFAULT_OUT_JSON = os.path.join(ROOT_DIR, "docs", "uk", "data", "pc_data.json")
 DEFAULT_OUT_IMAGES = os.path.join(ROOT_DIR, "python", "pc", "out_images")
+DEFAULT_OUT_SHARDS = os.path.join(ROOT_DIR, "docs", "uk", "data", "pc_shards")
+DEFAULT_OUT_DB = os.path.join(ROOT_DIR, "python", "pc", "data_file", "pc_catalogue.sqlite3")
+DEFAULT_STATIC_IMAGES = os.path.join(ROOT_DIR, "docs", "uk", "img")
 
 CREDS_DIR = os.path.join(ROOT_DIR, "python", "pc", "credentials")
 OAUTH_CLIENT_JSON = os.path.join(CREDS_DIR, "oauth_client.json")
 TOKEN_JSON = os.path.join(CREDS_DIR, "token.json")
 
+# sha256 -> Drive file, so unchanged images are never uploaded twice
+UPLOAD_MANIFEST_JSON = os.path.join(ROOT_DIR, "python", "pc", "cache", "upload_manifest.json")
+
+# Finished uploads of the running export(s), fsynced one line at a time (--resume replays them)
+UPLOAD_JOURNAL_DIR = os.path.join(ROOT_DIR, "python", "pc", "cache", "journal")
+
+# One JSON line of metrics per run; profiler reports (PC_EXPORT_PROFILE=cpu,mem) go to PROFILE_DIR
+METRICS_JSONL = os.path.join(ROOT_DIR, "python", "pc", "cache", "metrics.jsonl")
+PROFILE_DIR = os.path.join(ROOT_DIR, "python", "pc", "cache", "profile")
+
 SCOPES = ["https://www.googleapis.com/auth/drive.file"]  # only files this app creates
 
+# Files below this size go up in one multipart request; only bigger ones open a
+# resumable session (which costs an extra round trip to start).
+RESUMABLE_THRESHOLD_BYTES = 5 * 1024 * 1024
+
+# Drive batch requests accept at most 100 calls
+DRIVE_BATCH_SIZE = 100
+
+# Batch mode: how long a worker waits for an image another worker claimed to upload
+SHARED_UPLOAD_WAIT_SECONDS = 30 * 60
+
+
+# Set in batch worker processes so interleaved output shows which workbook it is from
+LOG_PREFIX = ""
+
 
 def log(msg: str):
-    print(msg, flush=True)
+    if LOG_PREFIX:
+        msg = "\n".join(LOG_PREFIX + line if line else line for line in msg.split("\n"))
+    print(msg + "\n", end="", flush=True)  # one write per message: lines from workers don't interleave
 
 
 def safe_filename(s: str) -> str:
@@ -58,6 +122,32 @@ def normalize_header(h: str) -> str:
     return re.sub(r"[\s\-]+", "_", str(h).strip().lower())
 
 
+def open_workbook_streaming(path: str):
+    """Open the workbook read-only: cells are streamed from the xml, no cell model is built."""
+    return openpyxl.load_workbook(path, read_only=True)
+
+
+def read_headers(ws, header_row: int) -> list:
+    """Read the header row; empty header cells become col_<n>."""
+    row = next(ws.iter_rows(min_row=header_row, max_row=header_row, values_only=True), ())
+    return [str(v).strip() if v is not None else f"col_{c}" for c, v in enumerate(row, start=1)]
+
+
+def iter_product_rows(ws, headers: list, start_row: int):
+    """
+    Stream data rows with iter_rows(values_only=True).
+    Yields (row_number, record) for every non-empty row; record keys are the header names
+    (see product_record.py: the row's value tuple is kept as is, no dict per row).
+    """
+    schema = RecordSchema(headers)
+    rows = ws.iter_rows(min_row=start_row, max_col=len(headers), values_only=True)
+    for r, row_vals in enumerate(rows, start=start_row):
+        if all(v is None or str(v).strip() == "" for v in row_vals):
+            continue
+
+        yield r, ProductRecord(schema, row_vals, r)
+
+
 def get_oauth_credentials() -> Credentials:
     """
     Loads token.json if present, otherwise performs OAuth login.
@@ -85,36 +175,66 @@ def get_oauth_credentials() -> Credentials:
             flow = InstalledAppFlow.from_client_secrets_file(OAUTH_CLIENT_JSON, SCOPES)
             creds = flow.run_local_server(port=0)
 
-        with open(TOKEN_JSON, "w", encoding="utf-8") as token:
+        # temp file + rename: batch workers may read token.json while it is rewritten
+        tmp_path = f"{TOKEN_JSON}.tmp.{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as token:
             token.write(creds.to_json())
+        os.replace(tmp_path, TOKEN_JSON)
         log(f"✅ Saved token: {TOKEN_JSON}")
 
     return creds
 
 
-def build_drive_service(creds: Credentials):
-    """Build a Drive API client."""
-    return build("drive", "v3", credentials=creds)
-
-
-def upload_to_drive(service, local_path: str, folder_id: str) -> str:
+def _create_drive_file(service, filename: str, media, folder_id: str):
     """
-    Uploads a file to Drive into folder_id.
+    Creates the file in Drive folder_id. Returns (file_id, direct_link).
     IMPORTANT: Does NOT set per-file public permissions.
     You said your target folder is already public, so we skip permissions for speed.
     """
-    filename = os.path.basename(local_path)
     metadata = {"name": filename}
     if folder_id:
         metadata["parents"] = [folder_id]
 
-    media = MediaFileUpload(local_path, resumable=True)
     created = service.files().create(body=metadata, media_body=media, fields="id").execute()
     file_id = created["id"]
 
     # Direct link works well for <img src=""> if the file is accessible via folder sharing.
     direct_link = f"https://drive.google.com/uc?id={file_id}"
-    return direct_link
+    return file_id, direct_link
+
+
+def upload_bytes_to_drive(service, data: bytes, filename: str, folder_id: str):
+    """
+    Uploads in-memory image bytes to Drive into folder_id. Returns (file_id, direct_link).
+    BytesIO over a bytes object shares its buffer (no copy until written to).
+    """
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    resumable = len(data) >= RESUMABLE_THRESHOLD_BYTES
+    media = MediaIoBaseUpload(io.BytesIO(data), mimetype=mimetype, resumable=resumable)
+    return _create_drive_file(service, filename, media, folder_id)
+
+
+def find_missing_drive_files(service, file_ids: list) -> set:
+    """
+    Check many Drive files with batched metadata requests (100 gets per HTTP call).
+    Returns the ids that are gone (404) or trashed. Other errors count as present.
+    """
+    missing = set()
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            if int(getattr(getattr(exception, "resp", None), "status", 0) or 0) == 404:
+                missing.add(request_id)
+        elif response.get("trashed"):
+            missing.add(request_id)
+
+    for i in range(0, len(file_ids), DRIVE_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=on_response)
+        for file_id in file_ids[i:i + DRIVE_BATCH_SIZE]:
+            batch.add(service.files().get(fileId=file_id, fields="id,trashed"), request_id=file_id)
+        batch.execute()
+
+    return missing
 
 
 def format_duration(seconds: float) -> str:
@@ -129,25 +249,137 @@ def format_duration(seconds: float) -> str:
     return f"{s}s"
 
 
-def main():
-    t0 = time.perf_counter()
-
-    # ---- CONFIG ----
-    EXCEL_PATH = DEFAULT_XLSX
-    OUT_JSON_PATH = DEFAULT_OUT_JSON
-    OUT_IMAGES_DIR = DEFAULT_OUT_IMAGES
-
-    # Your Drive folder is already public (Anyone with link).
-    DRIVE_FOLDER_ID = "1s-DCoV7rkhLllBhTVOm2SZ7IlA0JmiEB"
-
-    DEFAULT_HEADER_ROW = 4
-    DEFAULT_IMAGE_COLUMN_INDEX = 14  # 1-based column index (14 = N)
+def default_config() -> dict:
+    """
+    Export settings for export_workbook(). A batch config file (--config) uses the same
+    names in lower case, e.g. {"header_row": 4, "drive_folder_id": "..."}.
+    """
+    return {
+        "EXCEL_PATH": DEFAULT_XLSX,
+        "OUT_JSON_PATH": DEFAULT_OUT_JSON,
+        "OUT_IMAGES_DIR": DEFAULT_OUT_IMAGES,
+        "OUT_SHARDS_DIR": DEFAULT_OUT_SHARDS,
+        # None = pc_search.json / pc_master.json next to OUT_JSON_PATH
+        "OUT_SEARCH_PATH": None,
+        "OUT_MASTER_PATH": None,
+        "UPLOAD_MANIFEST_PATH": UPLOAD_MANIFEST_JSON,
+        "UPLOAD_JOURNAL_DIR": UPLOAD_JOURNAL_DIR,
+        "METRICS_PATH": METRICS_JSONL,
+
+        # Where images go: "drive" (uploaded to DRIVE_FOLDER_ID) or "static" (written to
+        # STATIC_IMAGES_DIR as <sha256 prefix>.<ext>, offline, no Google login). Static names
+        # never change content, so the site can cache them forever. imageUrl is
+        # STATIC_IMAGES_URL + name, where STATIC_IMAGES_URL is the https:// URL the folder is
+        # served from: the product master carries imageUrl into UK_OrderItems, where a relative
+        # URL is broken (one is only accepted with WRITE_PRODUCT_MASTER off).
+        "IMAGE_TARGET": "drive",
+        "STATIC_IMAGES_DIR": DEFAULT_STATIC_IMAGES,
+        "STATIC_IMAGES_URL": None,
+
+        # Your Drive folder is already public (Anyone with link).
+        "DRIVE_FOLDER_ID": "1s-DCoV7rkhLllBhTVOm2SZ7IlA0JmiEB",
+
+        "HEADER_ROW": 4,
+        "IMAGE_COLUMN_INDEX": 14,  # 1-based column index (14 = N)
+
+        "SHEET_NAME": None,
+
+        # Batch mode: export every sheet whose name matches SHEET_PATTERN (dated price
+        # lists like "18.2.2026"), one JSON per sheet plus an index.json listing them.
+        "ALL_SHEETS": False,
+        "SHEET_PATTERN": r"^\d{1,2}[./-]\d{1,2}[./-]\d{2,4}$",
+
+        # False = text-only run (rows -> JSON, no image extraction / upload)
+        "EXTRACT_IMAGES": True,
+
+        # Images are uploaded straight from memory. True = also write them to OUT_IMAGES_DIR.
+        "SAVE_LOCAL_IMAGES": False,
+
+        # Opt-in (--incremental): diff against the previous pc_data.json and write
+        # pc_data.delta.json next to it (an unchanged sheet leaves pc_data.json untouched).
+        # Images whose zip entry (crc32 + size) is already in the upload manifest are not
+        # decompressed, hashed or uploaded again. False = full rebuild.
+        "INCREMENTAL": False,
+
+        # Before reusing cached uploads, check (in batches of 100) that their Drive files
+        # still exist and are not trashed. Needs Drive login even when nothing is new.
+        "VERIFY_CACHED_UPLOADS": False,
+
+        # Every finished upload is appended to a journal in UPLOAD_JOURNAL_DIR right away.
+        # True = first record the uploads of interrupted runs in the manifest, so only the
+        # images they did not get to are uploaded.
+        "RESUME": False,
+
+        # Opt-in (--normalize-images): resize + re-encode images before upload (runs in a
+        # process pool). Changes file names, formats and Drive contents, so every image is
+        # uploaded again once. False = upload the embedded images exactly as they are in the sheet.
+        "NORMALIZE_IMAGES": False,
+        "IMAGE_FORMAT": "webp",  # "webp" or "jpeg" (progressive)
+        "IMAGE_MAX_EDGE": 800,  # px, longest edge
+        "IMAGE_QUALITY": 80,
+        "NORMALIZE_WORKERS": os.cpu_count() or 2,
+
+        # Opt-in: size / scent variants often carry the same packshot, and images whose
+        # perceptual hash (64-bit dHash) differs in at most this many bits then share the
+        # first one's Drive file. Products whose pictures differ only in a small label also
+        # match, so check the result before turning it on. 0 = identical dHash only,
+        # None = byte-identical images only.
+        "NEAR_DUPLICATE_DISTANCE": None,
+
+        # Parallel upload settings: concurrency adapts between MIN and MAX from observed
+        # latency and Drive rate-limit responses, starting at START.
+        "UPLOAD_START_WORKERS": 6,
+        "UPLOAD_MIN_WORKERS": 1,
+        "UPLOAD_MAX_WORKERS": 16,
+        "UPLOAD_MAX_ATTEMPTS": 6,  # per image, first try included
+        "UPLOAD_RETRY_BUDGET": 200,  # total retries per run
+
+        # Opt-in (--shards): also publish the catalogue as compact per-brand JSON shards
+        # (+ .gz, + .br if the brotli package is installed) with an index.json manifest, so the
+        # storefront can load one brand at a time. SHARD_BY = "brand" or "page" (SHARD_PAGE_SIZE products each).
+        "WRITE_SHARDS": False,
+        "SHARD_BY": "brand",
+        "SHARD_PAGE_SIZE": 250,
+
+        # Opt-in (--search-index): also write pc_search.json next to the JSON: name/brand terms,
+        # exact barcodes and type-ahead prefix buckets -> product slots. Updated in place from
+        # the delta when possible.
+        "WRITE_SEARCH_INDEX": False,
+
+        # Opt-in (--master): also write pc_master.json, a columnar, barcode-sorted product master
+        # with only the fields the Apps Script ordering backend uses (see google_scripts/ProductMaster.gs).
+        "WRITE_PRODUCT_MASTER": False,
+
+        # Opt-in (--catalogue-db): also record the run in a SQLite catalogue: products upserted
+        # by product_id (indexed by barcode and brand) plus one price_history row per product
+        # and price list. Shared by all workbooks / sheets; see catalogue_db.py for the CLI.
+        "WRITE_CATALOGUE_DB": False,
+        "OUT_DB_PATH": DEFAULT_OUT_DB,
+
+        # Capacity of the queues between pipeline stages (bounds images held in memory)
+        "PIPELINE_QUEUE_SIZE": 32,
+    }
 
-    SHEET_NAME = None
 
-    # Parallel upload settings
-    MAX_WORKERS = 6  # try 5-10; too high may hit rate limits
-    # ----------------
+def print_banner(cfg: dict):
+    if cfg["NORMALIZE_IMAGES"]:
+        normalize_note = (
+            f"Images resized to max {cfg['IMAGE_MAX_EDGE']}px and re-encoded as {cfg['IMAGE_FORMAT']} "
+            f"(processes={cfg['NORMALIZE_WORKERS']})."
+        )
+    else:
+        normalize_note = "Images uploaded as embedded (no normalization)."
+    if cfg["IMAGE_TARGET"] == "static":
+        target_note = (
+            f"  - Images written to {cfg['STATIC_IMAGES_DIR']} under content-hash names "
+            "(no Drive, no Google login).\n"
+        )
+    else:
+        target_note = (
+            "  - Your Drive folder is already public → we will NOT set per-file permissions.\n"
+            f"  - Adaptive parallel uploads (start={cfg['UPLOAD_START_WORKERS']}, "
+            f"range {cfg['UPLOAD_MIN_WORKERS']}-{cfg['UPLOAD_MAX_WORKERS']}, retries with backoff).\n"
+        )
 
     log(
         "\n"
@@ -169,41 +401,491 @@ def main():
         "  - product_id = product_code + '_' + barcode\n"
         "\n"
         "⚡ Speed mode enabled:\n"
-        "  - Your Drive folder is already public → we will NOT set per-file permissions.\n"
-        f"  - Parallel uploads enabled (workers={MAX_WORKERS}).\n"
-        "\n"
-        "👉 You will be asked for:\n"
-        "  - Header row number (where the column names are)\n"
-        "  - Image column index (1=A, 2=B, ...)\n"
+        f"{target_note}"
+        f"  - {normalize_note}\n"
     )
 
-    HEADER_ROW = prompt_int("Enter header row number", DEFAULT_HEADER_ROW)
-    IMAGE_COLUMN_INDEX = prompt_int("Enter image column index (1=A, 2=B, ...)", DEFAULT_IMAGE_COLUMN_INDEX)
+
+def image_key(record, row: int, product_code_header: str, barcode_header: str) -> str:
+    """Base name of a row's image file: product_code + barcode."""
+    pc_val = record.get(product_code_header, "")
+    bc_val = record.get(barcode_header, "")
+
+    pc_str = safe_filename(pc_val if pc_val is not None else "NO_CODE")
+    bc_str = safe_filename(bc_val if bc_val is not None else f"row_{row}")
+
+    # Use product_code + barcode for uniqueness
+    return f"{pc_str}_{bc_str}".strip("_")
+
+
+def finalize_product(record, image_url, product_code_header: str, barcode_header: str):
+    """Fill in product_id and imageUrl of a row (in place) once its image URL is known."""
+    pc_val = record.get(product_code_header, "")
+    bc_val = record.get(barcode_header, "")
+
+    pc_str = safe_filename(pc_val if pc_val is not None else "")
+    bc_str = safe_filename(bc_val if bc_val is not None else "")
+
+    # ✅ stable product id
+    record.product_id = f"{pc_str}_{bc_str}".strip("_")
+
+    # ✅ imageUrl (drive direct link)
+    record.image_url = image_url
+    return record
+
+
+class ImagePipeline:
+    """
+    The images of one sheet: extract (+normalize) -> hash (+save) -> upload, each stage
+    in its own thread, handing work over through bounded queues (see pipeline.py).
+    Every row that gets a URL comes out of url_q as (row, url) as soon as the URL is
+    known. The manifest and the counters are shared by the stages, guarded by lock.
+    """
+
+    def __init__(self, cfg: dict, manifest: dict, upload_target: str, near_dups, run_metrics,
+                 upload_slot, upload_registry=None):
+        self.cfg = cfg
+        self.manifest = manifest
+        self.upload_target = upload_target
+        self.static_target = cfg["IMAGE_TARGET"] == "static"
+        self.near_dups = near_dups
+        self.run_metrics = run_metrics
+        self.upload_slot = upload_slot
+        self.upload_registry = upload_registry
+        self.todo = []
+        self.clients = None
+        self.journal = None
+        self.uploader = None
+
+        self.hash_q = MonitoredQueue("hash", cfg["PIPELINE_QUEUE_SIZE"])
+        self.upload_q = MonitoredQueue("upload", cfg["PIPELINE_QUEUE_SIZE"])
+        self.url_q = MonitoredQueue("json", 0)
+        self.queues = (self.hash_q, self.upload_q, self.url_q)
+
+        self.lock = threading.Lock()
+        self.used_names = defaultdict(int)
+        self.image_name_by_row = {}
+        self.rows_by_digest = {}  # digest -> rows waiting for (or served by) this run's upload
+        self.url_by_digest = {}  # digest -> URL uploaded in this run
+        self.sig_by_digest = {}
+        self.dhash_by_digest = {}
+        self.aliases_by_digest = defaultdict(list)  # digest -> near-duplicates waiting for its upload
+        self.upload_owner = uuid.uuid4().hex
+        self.claimed_digests = set()
+        self.published_digests = set()
+        self.remote_names = {}  # digest -> filename, for images another batch worker uploads
+
+        self.manifest_dirty = False
+        self.saved_count = 0
+        self.near_dup_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.fresh_uploads = 0
+        self.shared_hits = 0  # uploaded by another batch worker in this batch
+        self.uploads_done = 0
+        self.upload_started = None
+        self.failed = 0
+        self.upload_stats = None
+
+    def start(self, todo: list, clients, journal) -> list:
+        """Start the stages for todo [(row, media_path, sig, image_key)]; wait with join_all()."""
+        self.todo = todo
+        self.clients = clients  # None for the static target
+        self.journal = journal
+        stages = [
+            Stage("extract", self.extract_stage, downstream=(self.hash_q,)),
+            Stage("hash", self.hash_stage, upstream=self.hash_q, downstream=(self.upload_q,)),
+            Stage("upload", self.upload_stage, upstream=self.upload_q, downstream=(self.url_q,)),
+        ]
+        for stage in stages:
+            stage.start()
+        return stages
+
+    def image_filename(self, key: str, ext: str) -> str:
+        self.used_names[key] += 1
+        suffix = f"_{self.used_names[key]}" if self.used_names[key] > 1 else ""
+        return f"{key}{suffix}.{ext}"
+
+    def record_aliases(self, digest: str, file_id: str, url: str) -> list:
+        """Point the near-duplicates that shared this upload at its Drive file (caller holds lock)."""
+        aliases = self.aliases_by_digest.pop(digest, [])
+        for _, alias, name, sig, dhash, distance in aliases:
+            upload_manifest.record(
+                self.manifest, alias, self.upload_target, file_id, url, name, signature=sig, dhash=dhash_hex(dhash),
+                alias_of=digest, alias_distance=distance,
+            )
+        return aliases
+
+    def journal_upload(self, digest: str, file_id: str, url: str, filename: str, aliases: list):
+        self.journal.append(
+            self.rows_by_digest[digest][0], digest, self.upload_target, file_id, url, filename,
+            self.sig_by_digest[digest], dhash_hex(self.dhash_by_digest[digest]),
+        )
+        for row, alias, name, sig, dhash, distance in aliases:
+            self.journal.append(row, alias, self.upload_target, file_id, url, name, sig, dhash_hex(dhash),
+                                alias_of=digest, alias_distance=distance)
+
+    def extract_stage(self, stats):
+        cfg = self.cfg
+        normalize = cfg["NORMALIZE_IMAGES"]
+        workers = cfg["NORMALIZE_WORKERS"]
+        pool_ctx = ProcessPoolExecutor(max_workers=workers) if normalize else nullcontext()
+        with zipfile.ZipFile(cfg["EXCEL_PATH"]) as zf, pool_ctx as pool:
+            pending = {}  # future -> (row, sig, key); bounded so only a few images are in flight
+
+            def drain(futures):
+                for fut in futures:
+                    row_, sig_, key_ = pending.pop(fut)
+                    ext_, data_, dhash_ = fut.result()
+                    self.hash_q.put((row_, sig_, key_, ext_, data_, dhash_))
+
+            for row, media_path, sig, key in self.todo:
+                t = time.perf_counter()
+                img_bytes = read_media(zf, media_path)
+                self.bytes_in += len(img_bytes)
+                if pool is None:
+                    self.hash_q.put((row, sig, key, media_ext(media_path), img_bytes, None))
+                else:
+                    fut = pool.submit(
+                        normalize_and_dhash, img_bytes, media_ext(media_path), cfg["IMAGE_FORMAT"],
+                        cfg["IMAGE_MAX_EDGE"], cfg["IMAGE_QUALITY"], self.near_dups is not None,
+                    )
+                    pending[fut] = (row, sig, key)
+                    if len(pending) >= 2 * workers:
+                        done_futs, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        drain(done_futs)
+                stats.add(time.perf_counter() - t)
+
+            drain(as_completed(list(pending)))
+
+    def hash_stage(self, stats):
+        cfg = self.cfg
+        target = self.upload_target
+        near_dups = self.near_dups
+        for row, sig, key, ext, img_bytes, dhash in iter_queue(self.hash_q):
+            t = time.perf_counter()
+            filename = self.image_filename(key, ext)
+            if cfg["SAVE_LOCAL_IMAGES"]:
+                with open(os.path.join(cfg["OUT_IMAGES_DIR"], filename), "wb") as f:
+                    f.write(img_bytes)
+                self.saved_count += 1
+            digest = upload_manifest.sha256_bytes(img_bytes)
+            if near_dups is not None and not cfg["NORMALIZE_IMAGES"]:
+                dhash = dhash_bytes(img_bytes)  # normalized images are hashed in the pool
+            new_upload = False
+
+            with self.lock:
+                self.image_name_by_row[row] = filename
+                self.bytes_out += len(img_bytes)
+                cached = upload_manifest.lookup(self.manifest, digest, target, cfg["NEAR_DUPLICATE_DISTANCE"])
+                near = near_dups.find(dhash) if dhash is not None else None
+                near_cached = upload_manifest.lookup(self.manifest, near, target) if near else None
+                if cached:
+                    # Same bytes were uploaded in an earlier run
+                    upload_manifest.add_signature(self.manifest, digest, sig)
+                    if dhash is not None and not cached.get("dhash"):
+                        cached["dhash"] = dhash_hex(dhash)  # manifests written before near-duplicate matching
+                        near_dups.add(dhash, digest)
+                    self.manifest_dirty = True
+                    self.cache_hits += 1
+                    self.url_q.put((row, cached["url"]))
+                elif digest in self.url_by_digest:
+                    self.url_q.put((row, self.url_by_digest[digest]))
+                elif digest in self.rows_by_digest:
+                    self.rows_by_digest[digest].append(row)  # upload already queued, share it
+                elif near_cached:
+                    # Looks like an image already on Drive: point this content at that file
+                    upload_manifest.record(
+                        self.manifest, digest, target, near_cached["fileId"], near_cached["url"], filename,
+                        signature=sig, dhash=dhash_hex(dhash),
+                        alias_of=near, alias_distance=hamming(dhash, int(near_cached["dhash"], 16)),
+                    )
+                    self.manifest_dirty = True
+                    self.near_dup_hits += 1
+                    self.url_q.put((row, near_cached["url"]))
+                elif near in self.rows_by_digest:
+                    # Looks like an image queued in this run: share its upload
+                    self.rows_by_digest[near].append(row)
+                    self.aliases_by_digest[near].append(
+                        (row, digest, filename, sig, dhash, hamming(dhash, self.dhash_by_digest[near]))
+                    )
+                    self.near_dup_hits += 1
+                else:
+                    self.rows_by_digest[digest] = [row]
+                    self.sig_by_digest[digest] = sig
+                    self.dhash_by_digest[digest] = dhash
+                    if dhash is not None:
+                        near_dups.add(dhash, digest)
+                    self.cache_misses += 1
+                    if self.upload_registry is None:
+                        new_upload = True
+                    elif shared_uploads.claim(self.upload_registry, target, digest, self.upload_owner):
+                        self.claimed_digests.add(digest)
+                        new_upload = True
+                    else:
+                        self.remote_names[digest] = filename
+
+            if new_upload:
+                self.upload_q.put((digest, filename, img_bytes))
+            stats.add(time.perf_counter() - t)
+
+            if len(self.image_name_by_row) % 25 == 0:
+                log(
+                    f"   ...hashed {len(self.image_name_by_row)}/{len(self.todo)} "
+                    f"| queues hash={self.hash_q.qsize()} upload={self.upload_q.qsize()}"
+                )
+
+    def upload_one(self, stats, item):
+        digest, filename, img_bytes = item
+        if self.static_target:
+            t = time.perf_counter()
+            ok = False
+            try:
+                ext = os.path.splitext(filename)[1].lstrip(".")
+                name, url = static_images.publish_image(
+                    self.cfg["STATIC_IMAGES_DIR"], self.cfg["STATIC_IMAGES_URL"], digest, ext, img_bytes
+                )
+                ok = True
+            finally:
+                self.run_metrics.record_upload(time.perf_counter() - t, len(img_bytes), ok)
+            with self.lock:
+                stats.add(time.perf_counter() - t, items=0)
+            return digest, filename, name, url
+        with self.upload_slot:
+            t = time.perf_counter()
+            ok = False
+            try:
+                file_id, url = upload_bytes_to_drive(
+                    self.clients.service(), img_bytes, filename, self.cfg["DRIVE_FOLDER_ID"]
+                )
+                ok = True
+            finally:
+                # throttled / failed attempts too, or retries would hide in the percentiles
+                self.run_metrics.record_upload(time.perf_counter() - t, len(img_bytes), ok)
+        with self.lock:
+            stats.add(time.perf_counter() - t, items=0)
+        return digest, filename, file_id, url
+
+    def on_upload_result(self, stats, item, result, error):
+        target = self.upload_target
+        registry = self.upload_registry
+        self.uploads_done += 1
+        with self.lock:
+            stats.add(0)
+            if error is not None:
+                self.failed += 1
+                log(f"❌ Upload failed for good: {item[1]}: {error}")
+                if registry is not None:
+                    shared_uploads.publish(registry, target, item[0], self.upload_owner)
+                    self.published_digests.add(item[0])
+            else:
+                digest, filename, file_id, url = result
+                if registry is not None:
+                    shared_uploads.publish(registry, target, digest, self.upload_owner, file_id, url)
+                    self.published_digests.add(digest)
+                upload_manifest.record(
+                    self.manifest, digest, target, file_id, url, filename,
+                    signature=self.sig_by_digest[digest], dhash=dhash_hex(self.dhash_by_digest[digest]),
+                )
+                aliases = self.record_aliases(digest, file_id, url)
+                self.manifest_dirty = True
+                self.url_by_digest[digest] = url
+                self.fresh_uploads += 1
+                for row in self.rows_by_digest[digest]:
+                    self.url_q.put((row, url))
+        if error is None:
+            self.journal_upload(digest, file_id, url, filename, aliases)
+
+        done = self.uploads_done
+        if done % 25 == 0:
+            elapsed = time.perf_counter() - self.upload_started
+            rate = (done / elapsed) if elapsed > 0 else 0.0
+            log(
+                f"   ...uploaded {done}/{self.cache_misses} queued so far "
+                f"(fail={self.failed}, retries={self.uploader.retries}, workers={self.uploader.limit}) "
+                f"| avg {rate:.2f} files/sec | queue upload={self.upload_q.qsize()}"
+            )
+
+    def on_upload_retry(self, item, attempt, delay, error):
+        log(f"🔁 Retry {attempt}/{self.cfg['UPLOAD_MAX_ATTEMPTS'] - 1} in {delay:.1f}s "
+            f"(workers={self.uploader.limit}): {item[1]}: {error}")
+
+    def upload_stage(self, stats):
+        cfg = self.cfg
+        self.upload_started = time.perf_counter()
+        self.uploader = AdaptiveUploader(
+            partial(self.upload_one, stats),
+            start_workers=cfg["UPLOAD_START_WORKERS"],
+            min_workers=cfg["UPLOAD_MIN_WORKERS"],
+            max_workers=cfg["UPLOAD_MAX_WORKERS"],
+            max_attempts=cfg["UPLOAD_MAX_ATTEMPTS"],
+            retry_budget=cfg["UPLOAD_RETRY_BUDGET"],
+        )
+
+        # upload_q is closed with END (None) by the save stage
+        try:
+            self.uploader.run(self.upload_q, partial(self.on_upload_result, stats), on_retry=self.on_upload_retry)
+        finally:
+            # never leave another batch worker waiting for an image this run claimed
+            for digest in self.claimed_digests - self.published_digests:
+                shared_uploads.publish(self.upload_registry, self.upload_target, digest, self.upload_owner)
+        self.upload_stats = self.uploader.stats()
+        self.collect_shared_uploads()
+
+    def collect_shared_uploads(self):
+        """Wait for the images other batch workers claimed and hand their URLs on."""
+        target = self.upload_target
+        if self.remote_names:
+            log(f"⏳ Waiting for {len(self.remote_names)} image(s) uploaded by other batch workers...")
+        for digest, entry in shared_uploads.wait_for(
+            self.upload_registry, target, list(self.remote_names), SHARED_UPLOAD_WAIT_SECONDS
+        ):
+            name = self.remote_names[digest]
+            with self.lock:
+                if entry is None or entry["state"] != "done":
+                    self.failed += 1
+                    log(f"❌ Upload by another batch worker failed: {name}")
+                    continue
+                upload_manifest.record(
+                    self.manifest, digest, target, entry["fileId"], entry["url"], name,
+                    signature=self.sig_by_digest[digest], dhash=dhash_hex(self.dhash_by_digest[digest]),
+                )
+                aliases = self.record_aliases(digest, entry["fileId"], entry["url"])
+                self.manifest_dirty = True
+                self.url_by_digest[digest] = entry["url"]
+                self.shared_hits += 1
+                for row in self.rows_by_digest[digest]:
+                    self.url_q.put((row, entry["url"]))
+            self.journal_upload(digest, entry["fileId"], entry["url"], name, aliases)
+
+
+def snapshot_meta(cfg: dict, sheet: str, count: int, images_with_url: int, images: ImagePipeline,
+                  pipeline_report=None, metrics=None) -> dict:
+    """The "meta" section of a sheet's JSON snapshot."""
+    static_target = cfg["IMAGE_TARGET"] == "static"
+    return {
+        "generatedAt": datetime.utcnow().isoformat() + "Z",
+        "sourceFile": os.path.basename(cfg["EXCEL_PATH"]),
+        "sheet": sheet,
+        "count": count,
+        "imagesExtracted": len(images.image_name_by_row),
+        "imagesUploaded": images.fresh_uploads,
+        "imagesReused": images_with_url - images.fresh_uploads,
+        "imagesWithUrl": images_with_url,
+        "imagesNearDuplicate": images.near_dup_hits,
+        "headerRow": cfg["HEADER_ROW"],
+        "imageColumnIndex": cfg["IMAGE_COLUMN_INDEX"],
+        "parallelWorkers": cfg["UPLOAD_START_WORKERS"],
+        "uploadScheduler": images.upload_stats,
+        "pipeline": pipeline_report,
+        "metrics": metrics,  # the run's final metrics, filled in when the snapshot is published
+        "imageNormalization": (
+            {"format": cfg["IMAGE_FORMAT"], "maxEdge": cfg["IMAGE_MAX_EDGE"], "quality": cfg["IMAGE_QUALITY"]}
+            if cfg["NORMALIZE_IMAGES"] else None
+        ),
+        "imageTarget": cfg["IMAGE_TARGET"],
+        "driveFolderId": None if static_target else cfg["DRIVE_FOLDER_ID"],
+        "note": None if static_target else "Per-file permissions not set (folder is already public).",
+        "productIdRule": "product_id = product_code + '_' + barcode",
+    }
+
+
+def export_workbook(cfg: dict, upload_slots=None, manifest_lock=None, upload_registry=None) -> dict:
+    """
+    Export one sheet: product rows -> JSON, embedded images -> Drive, plus the side
+    artifacts (delta, search index, product master, shards). cfg is default_config()
+    with overrides. Batch workers share upload_slots (a semaphore bounding concurrent
+    Drive uploads across processes), manifest_lock and upload_registry (a Manager dict,
+    see shared_uploads.py, so an image found by several workers is uploaded once);
+    all three are None for a single run. Returns a short summary of the run.
+    """
+    t0 = time.perf_counter()
+    run_metrics = RunMetrics()
+    upload_slot = upload_slots if upload_slots is not None else nullcontext()
+
+    EXCEL_PATH = cfg["EXCEL_PATH"]
+    OUT_JSON_PATH = cfg["OUT_JSON_PATH"]
+    OUT_IMAGES_DIR = cfg["OUT_IMAGES_DIR"]
+    OUT_SHARDS_DIR = cfg["OUT_SHARDS_DIR"]
+    UPLOAD_MANIFEST_PATH = cfg["UPLOAD_MANIFEST_PATH"]
+    UPLOAD_JOURNAL_DIR = cfg["UPLOAD_JOURNAL_DIR"]
+    RESUME = cfg["RESUME"]
+    DRIVE_FOLDER_ID = cfg["DRIVE_FOLDER_ID"]
+    IMAGE_TARGET = cfg["IMAGE_TARGET"]
+    STATIC_IMAGES_DIR = cfg["STATIC_IMAGES_DIR"]
+    STATIC_IMAGES_URL = cfg["STATIC_IMAGES_URL"]
+    HEADER_ROW = cfg["HEADER_ROW"]
+    IMAGE_COLUMN_INDEX = cfg["IMAGE_COLUMN_INDEX"]
+    SHEET_NAME = cfg["SHEET_NAME"]
+    EXTRACT_IMAGES = cfg["EXTRACT_IMAGES"]
+    SAVE_LOCAL_IMAGES = cfg["SAVE_LOCAL_IMAGES"]
+    INCREMENTAL = cfg["INCREMENTAL"]
+    VERIFY_CACHED_UPLOADS = cfg["VERIFY_CACHED_UPLOADS"]
+    NORMALIZE_IMAGES = cfg["NORMALIZE_IMAGES"]
+    IMAGE_FORMAT = cfg["IMAGE_FORMAT"]
+    IMAGE_MAX_EDGE = cfg["IMAGE_MAX_EDGE"]
+    IMAGE_QUALITY = cfg["IMAGE_QUALITY"]
+    NEAR_DUPLICATE_DISTANCE = cfg["NEAR_DUPLICATE_DISTANCE"]
+    UPLOAD_START_WORKERS = cfg["UPLOAD_START_WORKERS"]
+    WRITE_SHARDS = cfg["WRITE_SHARDS"]
+    SHARD_BY = cfg["SHARD_BY"]
+    SHARD_PAGE_SIZE = cfg["SHARD_PAGE_SIZE"]
+    WRITE_SEARCH_INDEX = cfg["WRITE_SEARCH_INDEX"]
+    WRITE_PRODUCT_MASTER = cfg["WRITE_PRODUCT_MASTER"]
+    WRITE_CATALOGUE_DB = cfg["WRITE_CATALOGUE_DB"]
+    OUT_DB_PATH = cfg["OUT_DB_PATH"]
 
     log(f"\n📄 Excel: {EXCEL_PATH}")
     if not os.path.exists(EXCEL_PATH):
         raise FileNotFoundError(f"Excel not found: {EXCEL_PATH}")
+    if IMAGE_TARGET not in ("drive", "static"):
+        raise ValueError(f"❌ IMAGE_TARGET must be 'drive' or 'static', got {IMAGE_TARGET!r}")
+    if IMAGE_TARGET == "static" and not STATIC_IMAGES_URL:
+        raise ValueError(
+            f"❌ IMAGE_TARGET 'static' needs STATIC_IMAGES_URL, the absolute URL {STATIC_IMAGES_DIR} is "
+            "published at (there is no default): --static-images-url https://<site>/uk/img/, "
+            "static_images_url in a batch config, or make pc-static STATIC_IMAGES_URL=https://<site>/uk/img/"
+        )
+    if IMAGE_TARGET == "static" and WRITE_PRODUCT_MASTER and not static_images.is_absolute_url(STATIC_IMAGES_URL):
+        raise ValueError(f"❌ STATIC_IMAGES_URL must be an absolute http(s) URL while WRITE_PRODUCT_MASTER is on "
+                         f"(imageUrl is copied into UK_OrderItems), got {STATIC_IMAGES_URL!r}")
+
+    # Manifest / journal / batch registry key of the place images are published to
+    static_target = IMAGE_TARGET == "static"
+    UPLOAD_TARGET = static_images.target_key(STATIC_IMAGES_URL) if static_target else DRIVE_FOLDER_ID
 
-    os.makedirs(OUT_IMAGES_DIR, exist_ok=True)
     os.makedirs(os.path.dirname(OUT_JSON_PATH), exist_ok=True)
-    log(f"📁 Output images folder: {OUT_IMAGES_DIR}")
+    if SAVE_LOCAL_IMAGES:
+        os.makedirs(OUT_IMAGES_DIR, exist_ok=True)
+        log(f"📁 Output images folder: {OUT_IMAGES_DIR}")
+    if static_target:
+        os.makedirs(STATIC_IMAGES_DIR, exist_ok=True)
+        log(f"🗄️ Publishing images to {STATIC_IMAGES_DIR} (imageUrl = {STATIC_IMAGES_URL}<hash>.<ext>)")
     log(f"🧾 Output JSON: {OUT_JSON_PATH}\n")
 
-    log("📥 Loading workbook...")
-    wb = openpyxl.load_workbook(EXCEL_PATH)
+    OUT_DELTA_PATH = os.path.splitext(OUT_JSON_PATH)[0] + ".delta.json"
+    OUT_SEARCH_PATH = cfg["OUT_SEARCH_PATH"] or os.path.join(os.path.dirname(OUT_JSON_PATH), "pc_search.json")
+    OUT_MASTER_PATH = cfg["OUT_MASTER_PATH"] or os.path.join(os.path.dirname(OUT_JSON_PATH), "pc_master.json")
+    previous = incremental.load_previous_snapshot(OUT_JSON_PATH) if INCREMENTAL else None
+    prev_meta, prev_products = previous or (None, None)
+    if INCREMENTAL:
+        if previous:
+            log(f"⚡ Incremental mode: previous snapshot has {prev_meta.get('count')} product(s)")
+        else:
+            log("⚡ Incremental mode: no previous snapshot, doing a full export")
+
+    run_metrics.begin("load")
+    log("📥 Loading workbook (read-only, streaming rows)...")
+    wb = open_workbook_streaming(EXCEL_PATH)
     sh = wb[SHEET_NAME] if SHEET_NAME else wb[wb.sheetnames[0]]
     log(f"✅ Using sheet: {sh.title}")
-
-    max_col = sh.max_column
-    max_row = sh.max_row
-    log(f"📐 Sheet size: rows={max_row}, cols={max_col}")
+    log(f"📐 Sheet size: rows={sh.max_row}, cols={sh.max_column}")
 
     # Read headers
     log(f"🏷️ Reading headers from row {HEADER_ROW}...")
-    headers = []
-    for c in range(1, max_col + 1):
-        v = sh.cell(HEADER_ROW, c).value
-        headers.append(str(v).strip() if v is not None else f"col_{c}")
+    headers = read_headers(sh, HEADER_ROW)
 
     # Build header lookup (normalized -> column index)
     header_to_col = {}
@@ -238,182 +920,667 @@ def main():
     product_code_header_name = headers[product_code_col - 1]
     barcode_header_name = headers[barcode_col - 1]
 
-    # Read rows
-    log("📦 Reading product rows...")
-    start_data_row = HEADER_ROW + 1
-    products_by_row = {}
+    # Content-addressed upload cache (sha256 -> Drive file), see upload_manifest.py
+    run_metrics.begin("prepare")
+    journaled = upload_journal.load_journals(UPLOAD_JOURNAL_DIR) if RESUME else []
+    manifest = upload_manifest.load_manifest(UPLOAD_MANIFEST_PATH)
+    manifest_dirty = False
+    base_creds = None
+
+    journal_path = upload_journal.journal_path(UPLOAD_JOURNAL_DIR, OUT_JSON_PATH)
+    journal = None
+    if RESUME:
+        recovered = upload_journal.replay(journaled, manifest)
+        manifest_dirty = manifest_dirty or recovered > 0
+        log(f"♻️ Resume: {recovered} upload(s) recovered from interrupted run(s) ({UPLOAD_JOURNAL_DIR})")
+    elif os.path.exists(journal_path):
+        log(f"⚠️ Upload journal of an interrupted run found, starting over (use --resume to keep it): {journal_path}")
+
+    cached_ids = upload_manifest.folder_file_ids(manifest, UPLOAD_TARGET)
+    if static_target and EXTRACT_IMAGES and cached_ids:
+        # Local files: always cheap to check
+        missing_names = static_images.missing_images(STATIC_IMAGES_DIR, cached_ids)
+        if missing_names:
+            dropped = upload_manifest.drop_file_ids(manifest, missing_names)
+            manifest_dirty = True
+            log(f"⚠️ {dropped} published image(s) missing from {STATIC_IMAGES_DIR}, they will be written again")
+    elif VERIFY_CACHED_UPLOADS and EXTRACT_IMAGES and cached_ids:
+        log(f"🔎 Verifying {len(cached_ids)} cached Drive file(s) (batched)...")
+        base_creds = get_oauth_credentials()
+        missing_ids = find_missing_drive_files(DriveClientPool(base_creds).service(), cached_ids)
+        if missing_ids:
+            dropped = upload_manifest.drop_file_ids(manifest, missing_ids)
+            manifest_dirty = True
+            log(f"⚠️ {dropped} cached upload(s) no longer on Drive, they will be uploaded again")
+        else:
+            log("✅ All cached uploads still on Drive")
 
-    for r in range(start_data_row, max_row + 1):
-        row_vals = [sh.cell(r, c).value for c in range(1, max_col + 1)]
-        if all(v is None or str(v).strip() == "" for v in row_vals):
-            continue
+    sig_index = (
+        upload_manifest.signature_index(manifest, UPLOAD_TARGET, NEAR_DUPLICATE_DISTANCE) if INCREMENTAL else {}
+    )
 
-        obj = {}
-        for c, h in enumerate(headers, start=1):
-            obj[h] = row_vals[c - 1]
-        obj["_rowNumber"] = r
-        products_by_row[r] = obj
+    # Perceptual hashes of the images already on Drive (and, below, of this run's uploads)
+    near_dups = None
+    if NEAR_DUPLICATE_DISTANCE is not None and EXTRACT_IMAGES:
+        near_dups = NearDuplicateIndex(NEAR_DUPLICATE_DISTANCE)
+        for digest, entry in manifest.items():
+            if (entry.get("folderId") == UPLOAD_TARGET and entry.get("url") and entry.get("dhash")
+                    and not entry.get("aliasOf")):
+                near_dups.add(int(entry["dhash"], 16), digest)
 
-    log(f"✅ Products loaded: {len(products_by_row)}")
+    # Normalization settings are part of the signature: changing them re-processes every image
+    sig_suffix = f"@{profile_tag(IMAGE_FORMAT, IMAGE_MAX_EDGE, IMAGE_QUALITY)}" if NORMALIZE_IMAGES else ""
 
-    # Extract images
     log(f"🖼️ Finding embedded images anchored to column {IMAGE_COLUMN_INDEX}...")
-    images = getattr(sh, "_images", [])
-    log(f"🖼️ Total images detected in sheet: {len(images)}")
+    with zipfile.ZipFile(EXCEL_PATH) as zf:
+        _, sheet_path = resolve_sheet_path(zf, sh.title)
+        anchors = find_image_anchors(zf, sheet_path) if EXTRACT_IMAGES else []
+        log(f"🖼️ Total images detected in sheet: {len(anchors)}")
+
+        # Unchanged images (zip signature already in the manifest) need no work at all
+        cached_url_by_row = {}
+        changed_media = {}  # row -> (media_path, sig)
+        for row, media_path in column_media_by_row(anchors, IMAGE_COLUMN_INDEX).items():
+            sig = media_signature(zf, media_path) + sig_suffix
+            cached = sig_index.get(sig)
+            if cached:
+                cached_url_by_row[row] = cached["url"]
+            else:
+                changed_media[row] = (media_path, sig)
+
+    # Records are never held: the JSON pass below writes each one as soon as it is read.
+    # Only new or changed images need a first pass over the rows, for their file names
+    # (product_code + barcode) and to leave out images anchored outside product rows.
+    start_data_row = HEADER_ROW + 1
+    todo = []  # (row, media_path, sig, image_key)
+    if changed_media:
+        run_metrics.begin("rows")
+        log("📦 Reading the product rows of new or changed images...")
+        for row, record in iter_product_rows(sh, headers, start_data_row):
+            if row in changed_media:
+                media_path, sig = changed_media[row]
+                key = image_key(record, row, product_code_header_name, barcode_header_name)
+                todo.append((row, media_path, sig, key))
+    drive_url_by_row = {}
 
-    img_by_row = {}
-    for img in images:
-        anchor = img.anchor._from  # 0-based
-        row = anchor.row + 1
-        col = anchor.col + 1
 
-        if col != IMAGE_COLUMN_INDEX:
-            continue
-        if row not in products_by_row:
-            continue
+    # ---- Overlapped pipeline: extract (+normalize) -> hash (+save) -> upload -> JSON ----
+    run_metrics.begin("pipeline")
+    # Uploads start with the first extracted image; the URLs are collected in the main
+    # thread as they arrive, for the JSON pass below
+    images = ImagePipeline(
+        cfg, manifest, UPLOAD_TARGET, near_dups, run_metrics, upload_slot, upload_registry
+    )
+    pipeline_report = None
+    json_stats = StageStats("json")
+    json_stats.started = time.perf_counter()
+
+    if not todo:
+        log("ℹ️ No new or changed images, skipping extraction and upload.\n")
+    else:
+        if static_target:
+            clients = None  # images are written to STATIC_IMAGES_DIR, no Google login
+        else:
+            # OAuth once (IMPORTANT): do NOT do OAuth inside threads.
+            log("☁️ Preparing Google Drive credentials...")
+            base_creds = base_creds or get_oauth_credentials()
+            log("✅ Credentials ready")
 
-        img_bytes = img._data()
-        ext = (getattr(img, "format", None) or "jpg").lower()
-        if ext == "jpeg":
-            ext = "jpg"
+            # One client per worker thread, reused for all its uploads; token refresh is shared
+            clients = DriveClientPool(base_creds)
 
-        pc_val = products_by_row[row].get(product_code_header_name, "")
-        bc_val = products_by_row[row].get(barcode_header_name, "")
+        # A run resumed from this journal continues it; any other run starts it afresh
+        journal = upload_journal.UploadJournal(journal_path, keep=RESUME)
+        log(f"📓 Upload journal: {journal_path}")
 
-        pc_str = safe_filename(pc_val if pc_val is not None else "NO_CODE")
-        bc_str = safe_filename(bc_val if bc_val is not None else f"row_{row}")
+        log(
+            f"🏭 Pipeline: {len(todo)} image(s) -> extract -> hash -> upload "
+            f"(adaptive workers, start={UPLOAD_START_WORKERS}) -> JSON"
+        )
+        stages = images.start(todo, clients, journal)
+        for row, url in iter_queue(images.url_q):
+            t = time.perf_counter()
+            drive_url_by_row[row] = url
+            json_stats.add(time.perf_counter() - t)
+        join_all(stages)
+
+        json_stats.finished = time.perf_counter()
+        stage_stats = [stage.stats for stage in stages] + [json_stats]
+        log("📊 Pipeline stages:\n" + format_pipeline_report(stage_stats, images.queues))
+        pipeline_report = {
+            "stages": {st.name: st.report() for st in stage_stats},
+            "queues": {q.name: q.report() for q in images.queues},
+        }
+
+        if NORMALIZE_IMAGES and images.bytes_in:
+            log(
+                f"🗜️ Normalized images: {images.bytes_in / 1024:.0f} KB -> {images.bytes_out / 1024:.0f} KB "
+                f"({100 * images.bytes_out / images.bytes_in:.0f}%)"
+            )
+        if images.upload_stats:
+            log(f"🚦 Upload scheduler: {images.upload_stats}")
+        if images.cache_misses and clients is not None:
+            per_file_ms = 1000 * clients.build_seconds / images.cache_misses
+            log(
+                f"🔌 Drive clients: built {clients.builds} (token refreshes={clients.refreshes}) | "
+                f"setup overhead per file: {per_file_ms:.1f} ms"
+            )
+
+    if SAVE_LOCAL_IMAGES:
+        log(f"✅ Local images saved: {images.saved_count} -> {OUT_IMAGES_DIR}")
+    if images.near_dup_hits:
+        log(f"🪞 Near-duplicate images sharing an upload: {images.near_dup_hits} (dHash distance <= {NEAR_DUPLICATE_DISTANCE})")
+    if images.shared_hits:
+        log(f"🤝 Images uploaded once by another batch worker and reused: {images.shared_hits}")
+
+    if manifest_dirty or images.manifest_dirty:
+        if manifest_lock is None:
+            upload_manifest.save_manifest(UPLOAD_MANIFEST_PATH, manifest)
+        else:
+            with manifest_lock:
+                upload_manifest.merge_and_save(UPLOAD_MANIFEST_PATH, manifest)
+    if journal is not None:
+        journal.discard()  # everything it holds is in the saved manifest now
+    elif RESUME and os.path.exists(journal_path):
+        os.remove(journal_path)
+
+    # Build JSON (field names come from Excel header row): the rows are read (again), each
+    # record written to the snapshot's temp file as soon as it is read, in sheet order
+    run_metrics.begin("json")
+    run_metrics.bytes_extracted = images.bytes_in
+    log("🧾 Writing JSON snapshot...")
+    # Only the counts and metrics still change, so the snapshot reserves just enough room
+    meta_shape = snapshot_meta(cfg, sh.title, 0, 0, images, pipeline_report, run_metrics.summary())
+    meta_shape["metrics"]["phases"] = {
+        **meta_shape["metrics"]["phases"],
+        **{phase: {"wallSeconds": 0.0, "cpuSeconds": 0.0} for phase in ("json", "artifacts")},
+    }
+    snapshot = SnapshotWriter(OUT_JSON_PATH, meta_shape)
+    images_with_url = images_matched = sig_hits = 0
+    for row, record in iter_product_rows(sh, headers, start_data_row):
+        url = drive_url_by_row.get(row)
+        if row in cached_url_by_row:
+            url = cached_url_by_row[row]
+            sig_hits += 1
+        images_matched += row in cached_url_by_row or row in changed_media
+        images_with_url += bool(url)
+        snapshot.write_product(finalize_product(record, url, product_code_header_name, barcode_header_name))
+    # The side files below read the products back from the temp file, one at a time
+    products = snapshot.products()
+    images.cache_hits += sig_hits
+
+    log(f"✅ Products loaded: {len(products)}")
+    log(f"✅ Images matched to product rows: {images_matched}")
+    if INCREMENTAL:
+        log(f"⚡ Unchanged images skipped (zip signature in manifest): {sig_hits}")
+    log(f"🗂️ Upload cache: hits={images.cache_hits}, misses={images.cache_misses} ({UPLOAD_MANIFEST_PATH})")
+    reused_count = images_with_url - images.fresh_uploads  # manifest hits + rows sharing one upload
+    log(
+        f"✅ Upload step done. URLs: {images_with_url} "
+        f"(fresh uploads={images.fresh_uploads}, reused={reused_count}, failed={images.failed})\n"
+    )
 
-        # Use product_code + barcode for uniqueness
-        img_key = f"{pc_str}_{bc_str}".strip("_")
-        img_by_row[row] = (img_key, ext, img_bytes)
+    meta = snapshot_meta(cfg, sh.title, len(products), images_with_url, images, pipeline_report)
 
-    log(f"✅ Images matched to product rows: {len(img_by_row)}")
+    brand_header_name = headers[header_to_col["brand"] - 1] if "brand" in header_to_col else None
 
-    # Save images locally
-    log("💾 Saving images locally...")
-    used = defaultdict(int)
-    local_path_by_row = {}
+    delta = None
+    if previous:
+        price_header_name = headers[header_to_col["price"] - 1]
+        try:
+            delta, prev_ids, prev_by_id, cur_by_id = incremental.diff_snapshots(
+                prev_products, products, price_header_name
+            )
+            log(f"⚡ Changes vs previous snapshot: {incremental.summarize_delta(delta)}")
+        except ValueError as e:
+            log(f"⚠️ Previous snapshot is unreadable ({e}), no delta written")
+
+    publish_snapshot = delta is None or not incremental.delta_is_empty(delta)
+    if not publish_snapshot:
+        log("⚡ No product changes, snapshot left untouched.")
+
+    if delta is not None:
+        incremental.write_delta(OUT_DELTA_PATH, delta, prev_meta, meta)
+        log(f"⚡ Delta written: {OUT_DELTA_PATH}")
+
+    run_metrics.begin("artifacts")
+    if WRITE_SEARCH_INDEX:
+        search_fields = {
+            "name": headers[header_to_col["name"] - 1],
+            "barcode": barcode_header_name,
+            "brand": brand_header_name,
+        }
+        index = search_index.load_index(OUT_SEARCH_PATH) if delta is not None else None
+        if delta is not None and search_index.index_matches(index, search_fields, prev_ids):
+            if incremental.delta_is_empty(delta):
+                log(f"🔍 Search index unchanged: {OUT_SEARCH_PATH}")
+                index = None
+            elif search_index.update_index(index, delta, prev_by_id, cur_by_id):
+                log("🔍 Search index updated from the delta")
+            else:
+                index = search_index.build_index(products, search_fields)
+                log("🔍 Search index rebuilt (too many removed products)")
+        else:
+            index = search_index.build_index(products, search_fields)
+            log("🔍 Search index built")
+        if index is not None:
+            search_index.write_index(OUT_SEARCH_PATH, index, meta)
+            log(f"🔍 Search index: {len(index['terms'])} terms, {len(index['barcodes'])} barcodes -> {OUT_SEARCH_PATH}")
+
+    if WRITE_PRODUCT_MASTER:
+        master_fields = {f: headers[col - 1] for f, col in header_to_col.items()}
+        master_fields["imageUrl"] = "imageUrl"
+        master = build_master(products, master_fields, meta["sourceFile"])
+        if write_master(OUT_MASTER_PATH, master):
+            log(f"📇 Product master: {master['count']} barcode(s) -> {OUT_MASTER_PATH}")
+        else:
+            log(f"📇 Product master unchanged: {OUT_MASTER_PATH}")
+        if master["duplicateBarcodes"]:
+            log(f"⚠️ {master['duplicateBarcodes']} row(s) share a barcode with an earlier row (first one kept)")
 
-    for i, (row, (img_key, ext, img_bytes)) in enumerate(img_by_row.items(), start=1):
-        used[img_key] += 1
-        suffix = f"_{used[img_key]}" if used[img_key] > 1 else ""
-        filename = f"{img_key}{suffix}.{ext}"
-        local_path = os.path.join(OUT_IMAGES_DIR, filename)
+    if WRITE_CATALOGUE_DB:
+        db_fields = {f: headers[col - 1] for f, col in header_to_col.items()}
+        conn = catalogue_db.connect(OUT_DB_PATH)
+        try:
+            run_id, added = catalogue_db.record_run(
+                conn, products, db_fields, meta, parse_sheet_date(sh.title)
+            )
+        finally:
+            conn.close()
+        if added:
+            log(f"🗄️ Catalogue DB: run {run_id}, {len(products)} product(s) + price history -> {OUT_DB_PATH}")
+        else:
+            log(f"🗄️ Catalogue DB: price list already recorded (run {run_id}), products updated")
+
+    if WRITE_SHARDS:
+        shard_manifest = write_shards(
+            products,
+            OUT_SHARDS_DIR,
+            meta,
+            shard_by=SHARD_BY,
+            brand_field=brand_header_name,
+            page_size=SHARD_PAGE_SIZE,
+        )
+        shards = shard_manifest["shards"]
+        raw_kb = sum(s["bytes"] for s in shards) / 1024
+        gz_kb = sum(s["gzBytes"] for s in shards) / 1024
+        log(
+            f"🧩 Shards: {len(shards)} by {shard_manifest['shardBy']} -> {OUT_SHARDS_DIR} "
+            f"({raw_kb:.0f} KB raw, {gz_kb:.0f} KB gzip, encodings={shard_manifest['encodings']})"
+        )
 
-        with open(local_path, "wb") as f:
-            f.write(img_bytes)
+    wb.close()
+    run_metrics.end()
+    t_total = time.perf_counter() - t0
 
-        local_path_by_row[row] = local_path
-        if i % 25 == 0 or i == len(img_by_row):
-            log(f"   ...saved {i}/{len(img_by_row)}")
+    # Published last, so the embedded metrics cover every phase (same record as METRICS_PATH)
+    run_summary = run_metrics.summary(images.upload_stats)
+    if publish_snapshot:
+        meta["metrics"] = run_summary
+        snapshot.finish(meta)
+    else:
+        snapshot.discard()
+    append_jsonl(cfg["METRICS_PATH"], {
+        "generatedAt": meta["generatedAt"],
+        "sourceFile": meta["sourceFile"],
+        "sheet": sh.title,
+        "products": len(products),
+        "imagesUploaded": images.fresh_uploads,
+        **run_summary,
+    })
+    lat = run_summary["uploadLatencyMs"]
+    log("📈 Phases: " + ", ".join(f"{k}={v['wallSeconds']:.2f}s (cpu {v['cpuSeconds']:.2f}s)"
+                                  for k, v in run_summary["phases"].items()))
+    log(
+        f"📈 Peak RSS: {run_summary['peakRssMb']} MB | extracted {images.bytes_in / 1024 / 1024:.1f} MB, "
+        f"uploaded {run_metrics.bytes_uploaded / 1024 / 1024:.1f} MB | upload latency "
+        f"p50={lat['p50']} p95={lat['p95']} p99={lat['p99']} ms, retries={run_summary['uploadRetries']}"
+    )
+    log(f"📈 Metrics appended: {cfg['METRICS_PATH']}")
 
-    log(f"✅ Local images saved: {len(local_path_by_row)}\n")
+    log("\n✅ Done")
+    log(f"- Products: {len(products)}")
+    log(f"- Images extracted: {len(images.image_name_by_row)} (saved locally: {images.saved_count})")
+    log(f"- Images with URL: {images_with_url} (fresh uploads={images.fresh_uploads}, reused={reused_count})")
+    log(f"- Upload cache: hits={images.cache_hits}, misses={images.cache_misses}")
+    log(f"- Upload failures: {images.failed}")
+    log(f"- JSON written: {OUT_JSON_PATH}")
+    if not static_target:
+        log(f"- Token saved: {TOKEN_JSON}")
+    log(f"⏱️ Total time: {format_duration(t_total)}\n")
 
-    # OAuth once (IMPORTANT): do NOT do OAuth inside threads.
-    log("☁️ Preparing Google Drive credentials...")
-    base_creds = get_oauth_credentials()
-    log("✅ Credentials ready")
+    return {
+        "excelPath": EXCEL_PATH,
+        "sheet": sh.title,
+        "outJson": OUT_JSON_PATH,
+        "products": len(products),
+        "imagesUploaded": images.fresh_uploads,
+        "imagesReused": reused_count,
+        "uploadFailures": images.failed,
+        "seconds": round(t_total, 1),
+    }
 
-    # Helper: create independent creds per worker to avoid shared-state issues
-    base_creds_info = json.loads(base_creds.to_json())
 
-    def upload_one(row: int, path: str):
-        # Fresh creds object per thread (avoid races on refresh state)
-        creds = Credentials.from_authorized_user_info(base_creds_info, SCOPES)
-        service = build_drive_service(creds)
-        url = upload_to_drive(service, path, DRIVE_FOLDER_ID)
-        return row, url
+def prompt_config(cfg: dict) -> dict:
+    """Ask for header row and image column at the prompt (the `make pc` flow)."""
+    print_banner(cfg)
+    log(
+        "👉 You will be asked for:\n"
+        "  - Header row number (where the column names are)\n"
+        "  - Image column index (1=A, 2=B, ...)\n"
+    )
+    cfg["HEADER_ROW"] = prompt_int("Enter header row number", cfg["HEADER_ROW"])
+    cfg["IMAGE_COLUMN_INDEX"] = prompt_int("Enter image column index (1=A, 2=B, ...)", cfg["IMAGE_COLUMN_INDEX"])
+    return cfg
 
-    # Parallel upload
-    items = list(local_path_by_row.items())
-    total = len(items)
-    drive_url_by_row = {}
 
-    log(f"⬆️ Uploading {total} image(s) to Drive (parallel workers={MAX_WORKERS})...")
-    up_start = time.perf_counter()
+def apply_settings(cfg: dict, settings: dict, where: str, base_dir: str = None) -> dict:
+    """
+    Apply lower-case settings from a config file / command line onto cfg.
+    Relative *_path / *_dir values are resolved against base_dir (default: cwd).
+    """
+    for key, value in settings.items():
+        name = key.upper()
+        if name not in cfg:
+            raise ValueError(f"❌ Unknown setting in {where}: {key}")
+        if value is not None and name.endswith(("_PATH", "_DIR")):
+            value = os.path.abspath(os.path.join(base_dir or os.getcwd(), value))
+        cfg[name] = value
+    return cfg
 
-    done = 0
-    failed = 0
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
-        futures = [ex.submit(upload_one, row, path) for row, path in items]
+def with_output_paths(cfg: dict, out_dir: str) -> dict:
+    """
+    Batch jobs write side by side, so every output is named after the job's JSON:
+    <out_dir>/<stem>.json, <stem>.delta.json, <stem>.search.json, <stem>.master.json,
+    <stem>_shards/ and out_images/<stem>/. Paths set explicitly in the job are kept.
+    """
+    defaults = default_config()
+    if cfg["OUT_JSON_PATH"] == defaults["OUT_JSON_PATH"]:
+        stem = os.path.splitext(os.path.basename(cfg["EXCEL_PATH"]))[0]
+        cfg["OUT_JSON_PATH"] = os.path.join(out_dir, f"{stem}.json")
+    base = os.path.splitext(cfg["OUT_JSON_PATH"])[0]
+    stem = os.path.basename(base)
+    if cfg["OUT_SEARCH_PATH"] is None:
+        cfg["OUT_SEARCH_PATH"] = f"{base}.search.json"
+    if cfg["OUT_MASTER_PATH"] is None:
+        cfg["OUT_MASTER_PATH"] = f"{base}.master.json"
+    if cfg["OUT_SHARDS_DIR"] == defaults["OUT_SHARDS_DIR"]:
+        cfg["OUT_SHARDS_DIR"] = f"{base}_shards"
+    if cfg["OUT_IMAGES_DIR"] == defaults["OUT_IMAGES_DIR"]:
+        cfg["OUT_IMAGES_DIR"] = os.path.join(defaults["OUT_IMAGES_DIR"], stem)
+    return cfg
+
+
+def parse_sheet_date(name: str):
+    """'18.2.2026' -> '2026-02-18' (day first, like the supplier sheets); None if not a date."""
+    m = re.match(r"^(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})$", str(name).strip())
+    if not m:
+        return None
+    day, month, year = (int(v) for v in m.groups())
+    if year < 100:
+        year += 2000
+    try:
+        return datetime(year, month, day).date().isoformat()
+    except ValueError:
+        return None
+
+
+def sheet_jobs(cfg: dict, out_dir: str) -> list:
+    """
+    One job per sheet matching SHEET_PATTERN. Outputs go to <out_dir>/<workbook>/<sheet>.json
+    (or next to an explicit out_json_path), with index.json listing all of them.
+    """
+    wb = openpyxl.load_workbook(cfg["EXCEL_PATH"], read_only=True)
+    names = wb.sheetnames
+    wb.close()
+    pattern = re.compile(cfg["SHEET_PATTERN"] or ".*")
+    selected = [n for n in names if pattern.search(n)]
+    skipped = [n for n in names if n not in selected]
+    if skipped:
+        log(f"ℹ️ {os.path.basename(cfg['EXCEL_PATH'])}: sheets not matching {cfg['SHEET_PATTERN']!r} skipped: "
+            f"{', '.join(skipped)}")
+    if not selected:
+        raise ValueError(f"❌ No sheet in {cfg['EXCEL_PATH']} matches {cfg['SHEET_PATTERN']!r}")
+
+    defaults = default_config()
+    stem = os.path.splitext(os.path.basename(cfg["EXCEL_PATH"]))[0]
+    if cfg["OUT_JSON_PATH"] == defaults["OUT_JSON_PATH"]:
+        sheet_dir = os.path.join(out_dir, stem)
+    else:
+        sheet_dir = os.path.splitext(cfg["OUT_JSON_PATH"])[0]
+
+    jobs = []
+    for name in selected:
+        job = dict(cfg, SHEET_NAME=name, OUT_JSON_PATH=os.path.join(sheet_dir, f"{safe_filename(name)}.json"))
+        if job["OUT_IMAGES_DIR"] == defaults["OUT_IMAGES_DIR"]:
+            job["OUT_IMAGES_DIR"] = os.path.join(defaults["OUT_IMAGES_DIR"], stem, safe_filename(name))
+        jobs.append(with_output_paths(job, out_dir))
+    return jobs
+
+
+def write_sheet_index(path: str, excel_path: str, results: list):
+    """index.json for an all-sheets export: one entry per sheet, newest date first."""
+    sheets = []
+    for r in results:
+        sheets.append({
+            "sheet": r["sheet"],
+            "date": parse_sheet_date(r["sheet"]),
+            "json": os.path.relpath(r["outJson"], os.path.dirname(path)),
+            "count": r["products"],
+            "imagesUploaded": r["imagesUploaded"],
+            "imagesReused": r["imagesReused"],
+        })
+    sheets.sort(key=lambda e: (e["date"] or "", e["sheet"]), reverse=True)
+    index = {
+        "generatedAt": datetime.utcnow().isoformat() + "Z",
+        "sourceFile": os.path.basename(excel_path),
+        "latest": sheets[0]["sheet"] if sheets else None,
+        "sheets": sheets,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def command_line_settings(args) -> dict:
+    flags = {
+        "header_row": args.header_row,
+        "image_column_index": args.image_column,
+        "sheet_name": args.sheet,
+        "drive_folder_id": args.drive_folder,
+        "all_sheets": args.all_sheets or None,
+        "resume": args.resume or None,
+        "incremental": args.incremental or None,
+        "image_target": args.image_target,
+        "static_images_url": args.static_images_url,
+        "sheet_pattern": args.sheet_pattern,
+        "normalize_images": args.normalize_images or None,
+        "write_shards": args.shards or None,
+        "write_search_index": args.search_index or None,
+        "write_product_master": args.master or None,
+        "write_catalogue_db": args.catalogue_db or None,
+    }
+    return {k: v for k, v in flags.items() if v is not None}
 
-        for fut in as_completed(futures):
-            try:
-                row, url = fut.result()
-                drive_url_by_row[row] = url
-            except Exception as e:
-                failed += 1
-                log(f"❌ Upload failed: {e}")
-            finally:
-                done += 1
-
-                if done % 25 == 0 or done == total:
-                    elapsed = time.perf_counter() - up_start
-                    rate = (done / elapsed) if elapsed > 0 else 0.0
-                    remaining = total - done
-                    eta = (remaining / rate) if rate > 0 else 0
-                    log(
-                        f"   ...uploaded {done}/{total} "
-                        f"(fail={failed}) | avg {rate:.2f} files/sec | ETA {format_duration(eta)}"
-                    )
 
-    uploaded_count = len(drive_url_by_row)
-    log(f"✅ Upload step done. URLs created: {uploaded_count} (failed={failed})\n")
-
-    # Build JSON (field names come from Excel header row)
-    log("🧾 Building JSON payload...")
-    products = []
-
-    for row, obj in products_by_row.items():
-        out = dict(obj)
-
-        pc_val = obj.get(product_code_header_name, "")
-        bc_val = obj.get(barcode_header_name, "")
-
-        pc_str = safe_filename(pc_val if pc_val is not None else "")
-        bc_str = safe_filename(bc_val if bc_val is not None else "")
-
-        # ✅ stable product id
-        out["product_id"] = f"{pc_str}_{bc_str}".strip("_")
-
-        # ✅ imageUrl (drive direct link)
-        out["imageUrl"] = drive_url_by_row.get(row)
-
-        products.append(out)
-
-    payload = {
-        "meta": {
-            "generatedAt": datetime.utcnow().isoformat() + "Z",
-            "sourceFile": os.path.basename(EXCEL_PATH),
-            "sheet": sh.title,
-            "count": len(products),
-            "imagesExtracted": len(local_path_by_row),
-            "imagesUploaded": uploaded_count,
-            "headerRow": HEADER_ROW,
-            "imageColumnIndex": IMAGE_COLUMN_INDEX,
-            "parallelWorkers": MAX_WORKERS,
-            "driveFolderId": DRIVE_FOLDER_ID,
-            "note": "Per-file permissions not set (folder is already public).",
-            "productIdRule": "product_id = product_code + '_' + barcode",
-        },
-        "products": products,
-    }
+def load_batch_jobs(args) -> list:
+    """
+    Build one config per workbook from --config and/or workbooks on the command line.
+    Precedence: default_config() < config "defaults" < command-line flags < per-job settings.
+    Config file:
+        {"defaults": {"drive_folder_id": "...", "header_row": 4},
+         "jobs": [{"excel_path": "a.xlsx", "sheet_name": "18.2.2026", "image_column_index": 14}, ...]}
+    """
+    base = default_config()
+    entries = []  # (job settings, base_dir, where)
+    if args.config:
+        config_dir = os.path.dirname(os.path.abspath(args.config))
+        with open(args.config, "r", encoding="utf-8") as f:
+            batch = json.load(f)
+        apply_settings(base, batch.get("defaults", {}), f"{args.config} defaults", config_dir)
+        for i, job in enumerate(batch.get("jobs", []), start=1):
+            entries.append((job, config_dir, f"{args.config} job {i}"))
+    for path in args.workbooks:
+        entries.append(({"excel_path": path}, None, "command line"))
+    apply_settings(base, command_line_settings(args), "command line")
+
+    out_dir = os.path.abspath(args.out_dir) if args.out_dir else os.path.dirname(DEFAULT_OUT_JSON)
+    if not entries and base["ALL_SHEETS"]:
+        entries.append(({}, None, "default workbook"))
+
+    jobs = []
+    for settings, base_dir, where in entries:
+        cfg = apply_settings(dict(base), settings, where, base_dir)
+        if cfg["ALL_SHEETS"]:
+            jobs += sheet_jobs(cfg, out_dir)
+        else:
+            jobs.append(with_output_paths(cfg, out_dir))
 
-    with open(OUT_JSON_PATH, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    outputs = [cfg["OUT_JSON_PATH"] for cfg in jobs]
+    clashes = sorted({p for p in outputs if outputs.count(p) > 1})
+    if clashes:
+        raise ValueError(f"❌ Several jobs write the same output, set out_json_path per job: {', '.join(clashes)}")
+    return jobs
 
-    t_total = time.perf_counter() - t0
 
-    log("\n✅ Done")
-    log(f"- Products: {len(products)}")
-    log(f"- Images extracted: {len(local_path_by_row)} -> {OUT_IMAGES_DIR}")
-    log(f"- Images uploaded (with URL): {uploaded_count}")
-    log(f"- Upload failures: {failed}")
-    log(f"- JSON written: {OUT_JSON_PATH}")
-    log(f"- Token saved: {TOKEN_JSON}")
-    log(f"⏱️ Total time: {format_duration(t_total)}\n")
+def _batch_worker(cfg: dict, upload_slots, manifest_lock, upload_registry) -> dict:
+    """Runs in a batch worker process; log lines are prefixed with the workbook (and sheet) name."""
+    global LOG_PREFIX
+    sheet = f" {cfg['SHEET_NAME']}" if cfg["ALL_SHEETS"] else ""
+    LOG_PREFIX = f"[{os.path.basename(cfg['EXCEL_PATH'])}{sheet}] "
+    return export_workbook(cfg, upload_slots=upload_slots, manifest_lock=manifest_lock,
+                           upload_registry=upload_registry)
+
+
+def run_batch(jobs: list, processes: int, upload_budget: int) -> int:
+    """
+    Export every job in a process pool. All workers draw Drive uploads from one shared
+    budget of upload_budget concurrent requests and save the shared upload manifest
+    under one lock. Returns the number of failed jobs.
+    """
+    t0 = time.perf_counter()
+    processes = max(1, min(processes, len(jobs)))
+    for cfg in jobs:
+        # split the normalization cores between the workbooks running at the same time
+        if cfg["NORMALIZE_WORKERS"] == default_config()["NORMALIZE_WORKERS"]:
+            cfg["NORMALIZE_WORKERS"] = max(1, (os.cpu_count() or 2) // processes)
+        cfg["UPLOAD_MAX_WORKERS"] = min(cfg["UPLOAD_MAX_WORKERS"], upload_budget)
+        cfg["UPLOAD_START_WORKERS"] = min(cfg["UPLOAD_START_WORKERS"], cfg["UPLOAD_MAX_WORKERS"])
+
+    log(f"🗃️ Batch: {len(jobs)} job(s), processes={processes}, shared upload budget={upload_budget}")
+    for cfg in jobs:
+        log(f"   - {cfg['EXCEL_PATH']} (sheet={cfg['SHEET_NAME'] or 'first'}) -> {cfg['OUT_JSON_PATH']}")
+
+    if any(cfg["EXTRACT_IMAGES"] and cfg["IMAGE_TARGET"] == "drive" for cfg in jobs):
+        # Log in (or refresh token.json) once here, so no worker ever opens a browser
+        log("☁️ Preparing Google Drive credentials...")
+        get_oauth_credentials()
+
+    results, failures = [], []
+    sheet_results = defaultdict(list)  # (index.json path, workbook) -> results of its sheets
+    with multiprocessing.Manager() as manager:
+        upload_slots = manager.BoundedSemaphore(upload_budget)
+        manifest_lock = manager.Lock()
+        upload_registry = manager.dict()
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {
+                pool.submit(_batch_worker, cfg, upload_slots, manifest_lock, upload_registry): cfg
+                for cfg in jobs
+            }
+            for fut in as_completed(futures):
+                cfg = futures[fut]
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    failures.append((cfg["EXCEL_PATH"], e))
+                    log(f"❌ {cfg['EXCEL_PATH']} [{cfg['SHEET_NAME'] or 'first sheet'}] failed: {e}")
+                    continue
+                results.append(result)
+                if cfg["ALL_SHEETS"]:
+                    index_path = os.path.join(os.path.dirname(cfg["OUT_JSON_PATH"]), "index.json")
+                    sheet_results[(index_path, cfg["EXCEL_PATH"])].append(result)
+
+    for (index_path, excel_path), sheet_runs in sheet_results.items():
+        write_sheet_index(index_path, excel_path, sheet_runs)
+        log(f"📚 Sheet index: {len(sheet_runs)} sheet(s) -> {index_path}")
+
+    log("\n🗃️ Batch done")
+    for r in results:
+        log(
+            f"   ✅ {os.path.basename(r['excelPath'])} [{r['sheet']}]: products={r['products']}, "
+            f"uploaded={r['imagesUploaded']}, reused={r['imagesReused']}, "
+            f"failed uploads={r['uploadFailures']}, {r['seconds']}s -> {r['outJson']}"
+        )
+    for path, e in failures:
+        log(f"   ❌ {os.path.basename(path)}: {e}")
+    log(f"⏱️ Batch time: {format_duration(time.perf_counter() - t0)}\n")
+    return len(failures)
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(
+        description="Export PC supplier workbooks to JSON with Drive image links. "
+                    "Without workbooks or --config: interactive run on the default workbook."
+    )
+    ap.add_argument("workbooks", nargs="*", help="xlsx files to export unattended")
+    ap.add_argument("--config", help="JSON batch config with defaults and per-workbook jobs")
+    ap.add_argument("--header-row", type=int, help=f"header row (default {default_config()['HEADER_ROW']})")
+    ap.add_argument("--image-column", type=int, help="1-based image column index (default 14 = N)")
+    ap.add_argument("--sheet", help="sheet name (default: first sheet)")
+    ap.add_argument("--drive-folder", help="Drive folder id for uploads")
+    ap.add_argument("--all-sheets", action="store_true",
+                    help="export every dated sheet (one JSON each + index.json), in parallel")
+    ap.add_argument("--sheet-pattern", help="regex for --all-sheets (default: dates like 18.2.2026)")
+    ap.add_argument("--image-target", choices=("drive", "static"),
+                    help="upload images to Drive (default) or write them to docs/uk/img, offline")
+    ap.add_argument("--static-images-url",
+                    help="absolute URL docs/uk/img is served from (imageUrl prefix for --image-target static)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="diff against the previous JSON (writes a .delta.json), skip unchanged images")
+    ap.add_argument("--resume", action="store_true",
+                    help="reuse the uploads journaled by an interrupted run, upload only the rest")
+    ap.add_argument("--normalize-images", action="store_true",
+                    help="resize and re-encode images (webp, max 800px) before upload")
+    ap.add_argument("--shards", action="store_true",
+                    help="also write per-brand JSON shards (+ .gz/.br) with an index.json")
+    ap.add_argument("--search-index", action="store_true", help="also write the search index (pc_search.json)")
+    ap.add_argument("--master", action="store_true",
+                    help="also write the product master for the ordering backend (pc_master.json)")
+    ap.add_argument("--catalogue-db", action="store_true",
+                    help="also record the products and their prices in the SQLite catalogue (price history)")
+    ap.add_argument("--out-dir", help="output folder for batch jobs (default: docs/uk/data)")
+    ap.add_argument("--processes", type=int, default=os.cpu_count() or 2, help="workbooks exported at once")
+    ap.add_argument("--upload-budget", type=int, default=default_config()["UPLOAD_MAX_WORKERS"],
+                    help="concurrent Drive uploads shared by all workbooks")
+    ap.add_argument("-y", "--yes", action="store_true",
+                    help="no prompts for the default workbook: use the defaults / flags above")
+    return ap.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.image_target == "static" and not args.static_images_url and not args.config:
+        log("❌ --image-target static needs --static-images-url, the absolute URL docs/uk/img is published at "
+            "(there is no default), e.g. --static-images-url https://<site>/uk/img/")
+        return 2
+
+    if args.workbooks or args.config or args.all_sheets:
+        return 1 if run_batch(load_batch_jobs(args), args.processes, args.upload_budget) else 0
+
+    cfg = apply_settings(default_config(), command_line_settings(args), "command line")
+    if args.yes or (args.header_row and args.image_column):
+        print_banner(cfg)
+    else:
+        prompt_config(cfg)
+    export_workbook(cfg)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with profiling(PROFILE_DIR) as profile_reports:
+        exit_code = main()
+    for report_path in profile_reports:
+        log(f"🔬 Profile written ({PROFILE_ENV}): {report_path}")
+    sys.exit(exit_code)
@@ -0,0 +1,107 @@
+import io
+
+from PIL import Image
+
+from image_normalize import normalize_image
+
+
+HASH_BITS = 64
+
+# Flat or nearly flat images (placeholders, blank cells) hash to almost all zeros or
+# ones and would match each other regardless of colour: they are only deduplicated
+# by exact content.
+MIN_INFORMATIVE_BITS = 4
+
+
+def _popcount(x: int) -> int:
+    return bin(x).count("1")
+
+
+def hamming(a: int, b: int) -> int:
+    return _popcount(a ^ b)
+
+
+def dhash(im: Image.Image) -> int:
+    """
+    64-bit difference hash: grayscale 9x8 thumbnail, one bit per horizontal neighbour
+    pair (left brighter than right). Re-encoding, resizing and small label edits
+    change only a few bits. Transparent areas count as white (catalogue background).
+    """
+    if im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info):
+        rgba = im.convert("RGBA")
+        im = Image.new("RGB", rgba.size, (255, 255, 255))
+        im.paste(rgba, mask=rgba.getchannel("A"))
+    px = list(im.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    h = 0
+    for y in range(8):
+        for x in range(8):
+            h = (h << 1) | (px[y * 9 + x] > px[y * 9 + x + 1])
+    return h
+
+
+def dhash_bytes(img_bytes: bytes):
+    """dHash of an encoded image, or None if it cannot be decoded or is too flat to compare."""
+    try:
+        with Image.open(io.BytesIO(img_bytes)) as im:
+            im.draft("RGB", (64, 64))  # JPEG: decode at reduced size, plenty for 9x8
+            h = dhash(im)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    if not MIN_INFORMATIVE_BITS <= _popcount(h) <= HASH_BITS - MIN_INFORMATIVE_BITS:
+        return None
+    return h
+
+
+def dhash_hex(h):
+    return f"{h:016x}" if h is not None else None
+
+
+def normalize_and_dhash(img_bytes: bytes, src_ext: str, fmt: str, max_edge: int, quality: int, with_dhash: bool = True):
+    """
+    normalize_image() plus the dHash of the result (None if with_dhash is False), in the
+    same worker process so the image is only shipped once: (ext, bytes, dhash).
+    """
+    ext, data = normalize_image(img_bytes, src_ext, fmt, max_edge, quality)
+    return ext, data, dhash_bytes(data) if with_dhash else None
+
+
+class NearDuplicateIndex:
+    """
+    dHash -> key lookup within max_distance bits. The hash is split into
+    max_distance + 1 bands: two hashes that differ in at most max_distance bits agree
+    exactly on at least one band, so only keys sharing a band are compared.
+    """
+
+    def __init__(self, max_distance: int):
+        if not 0 <= max_distance < HASH_BITS // 2:
+            raise ValueError(f"near-duplicate distance must be 0-{HASH_BITS // 2 - 1}, got {max_distance}")
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        edges = [HASH_BITS * i // bands for i in range(bands + 1)]
+        self._bands = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(edges, edges[1:])]
+        self._buckets = [{} for _ in self._bands]
+        self._hashes = {}  # key -> (hash, insertion order)
+        self.size = 0
+
+    def add(self, h: int, key):
+        if key in self._hashes:
+            return
+        self._hashes[key] = (h, self.size)
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            buckets.setdefault((h >> shift) & mask, []).append(key)
+        self.size += 1
+
+    def find(self, h: int):
+        """Closest key within max_distance (earliest added on ties), or None."""
+        best, best_rank = None, (self.max_distance + 1, 0)
+        seen = set()
+        for (shift, mask), buckets in zip(self._bands, self._buckets):
+            for key in buckets.get((h >> shift) & mask, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                other, order = self._hashes[key]
+                rank = (hamming(h, other), order)
+                if rank < best_rank:
+                    best, best_rank = key, rank
+        return best
@@ -0,0 +1,58 @@
+import io
+
+from PIL import Image, ImageOps
+
+
+FORMATS = {
+    # format -> (Pillow format name, file extension)
+    "webp": ("WEBP", "webp"),
+    "jpeg": ("JPEG", "jpg"),
+}
+
+
+def profile_tag(fmt: str, max_edge: int, quality: int) -> str:
+    """Short tag for the normalization settings, e.g. 'webp-800-80'."""
+    return f"{fmt}-{max_edge}-{quality}"
+
+
+def normalize_image(img_bytes: bytes, src_ext: str, fmt: str = "webp", max_edge: int = 800, quality: int = 80):
+    """
+    Downscale so the longest edge is <= max_edge and re-encode as WebP or progressive JPEG.
+    Returns (ext, bytes). If the image cannot be decoded, or re-encoding would make an
+    image that was not resized bigger, the original bytes are returned unchanged.
+
+    Runs in worker processes (ProcessPoolExecutor), so it must stay a top-level function.
+    """
+    pil_format, ext = FORMATS[fmt]
+
+    try:
+        with Image.open(io.BytesIO(img_bytes)) as im:
+            im = ImageOps.exif_transpose(im)
+            resized = max(im.size) > max_edge
+            if resized:
+                im.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            has_alpha = im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info)
+            if pil_format == "JPEG":
+                if has_alpha:
+                    # JPEG has no alpha: flatten on white like the catalogue background
+                    rgba = im.convert("RGBA")
+                    im = Image.new("RGB", rgba.size, (255, 255, 255))
+                    im.paste(rgba, mask=rgba.getchannel("A"))
+                else:
+                    im = im.convert("RGB")
+            else:
+                im = im.convert("RGBA" if has_alpha else "RGB")
+
+            out = io.BytesIO()
+            if pil_format == "JPEG":
+                im.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+            else:
+                im.save(out, "WEBP", quality=quality, method=4)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return src_ext, img_bytes
+
+    data = out.getvalue()
+    if not resized and len(data) >= len(img_bytes):
+        return src_ext, img_bytes
+    return ext, data
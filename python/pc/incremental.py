@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+from product_record import json_default
+from snapshot_writer import read_snapshot
+
+
+# Row position is not part of a product's identity; inserting a row would otherwise
+# mark every product below it as changed.
+IGNORED_FIELDS = {"_rowNumber"}
+
+
+def load_previous_snapshot(path: str):
+    """
+    (meta, products) of the previous pc_data.json, or None if there is no usable snapshot.
+    Only the meta is read here; products streams the rest (snapshot_writer.SnapshotProducts).
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return read_snapshot(path)
+    except (OSError, ValueError):
+        return None
+
+
+def index_by_product_id(products) -> dict:
+    """product_id -> product. If an id repeats, the last row wins."""
+    return {p.get("product_id"): p for p in products if p.get("product_id")}
+
+
+def product_digest(product) -> bytes:
+    """Fingerprint of what diff_products() compares: equal products have equal digests."""
+    fields = {k: v for k, v in product.items() if k not in IGNORED_FIELDS and v is not None}
+    data = json.dumps(fields, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=json_default)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).digest()
+
+
+def diff_snapshots(prev_products, cur_products, price_field: str):
+    """
+    diff_products() for two snapshots read as streams: only a digest per product_id and
+    the products whose digest differs are kept in memory. Both iterables are read twice.
+    Returns (delta, prev_ids, prev_by_id, cur_by_id); the dicts hold just the products
+    the delta is about (what search_index.update_index needs).
+    """
+    prev_digests = {p.get("product_id"): product_digest(p) for p in prev_products if p.get("product_id")}
+    cur_digests = {p.get("product_id"): product_digest(p) for p in cur_products if p.get("product_id")}
+    differ = {pid for pid, digest in cur_digests.items() if prev_digests.get(pid) != digest}
+    differ.update(pid for pid in prev_digests if pid not in cur_digests)
+
+    prev_by_id = index_by_product_id(p for p in prev_products if p.get("product_id") in differ)
+    cur_by_id = index_by_product_id(p for p in cur_products if p.get("product_id") in differ)
+    return diff_products(prev_by_id, cur_by_id, price_field), set(prev_digests), prev_by_id, cur_by_id
+
+
+def diff_products(prev_by_id: dict, cur_by_id: dict, price_field: str) -> dict:
+    """
+    Classify products against the previous snapshot.
+    Returns {"added": [product], "removed": [product_id], "changed": [entry]} where each
+    changed entry is {"product_id", "changes": [price|image|fields], "set": {field: new value}}.
+    """
+    added = [p for pid, p in cur_by_id.items() if pid not in prev_by_id]
+    removed = [pid for pid in prev_by_id if pid not in cur_by_id]
+    changed = []
+
+    for pid, cur in cur_by_id.items():
+        prev = prev_by_id.get(pid)
+        if prev is None:
+            continue
+
+        keys = (set(cur) | set(prev)) - IGNORED_FIELDS
+        patch = {k: cur.get(k) for k in sorted(keys) if cur.get(k) != prev.get(k)}
+        if not patch:
+            continue
+
+        changes = []
+        if price_field in patch:
+            changes.append("price")
+        if "imageUrl" in patch:
+            changes.append("image")
+        if set(patch) - {price_field, "imageUrl"}:
+            changes.append("fields")
+        changed.append({"product_id": pid, "changes": changes, "set": patch})
+
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def summarize_delta(delta: dict) -> dict:
+    kinds = [c for entry in delta["changed"] for c in entry["changes"]]
+    return {
+        "added": len(delta["added"]),
+        "removed": len(delta["removed"]),
+        "priceChanged": kinds.count("price"),
+        "imageChanged": kinds.count("image"),
+        "fieldsChanged": kinds.count("fields"),
+    }
+
+
+def delta_is_empty(delta: dict) -> bool:
+    return not (delta["added"] or delta["removed"] or delta["changed"])
+
+
+def write_delta(path: str, delta: dict, base_meta: dict, meta: dict):
+    """Write the compact (no indent) delta file consumers can apply onto the previous snapshot."""
+    out = {
+        "meta": {
+            "generatedAt": datetime.utcnow().isoformat() + "Z",
+            "baseGeneratedAt": (base_meta or {}).get("generatedAt"),
+            "sourceFile": meta.get("sourceFile"),
+            "sheet": meta.get("sheet"),
+            "count": meta.get("count"),
+            **summarize_delta(delta),
+        },
+        **delta,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(out, f, ensure_ascii=False, separators=(",", ":"), default=json_default)
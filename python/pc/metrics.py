@@ -0,0 +1,188 @@
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+
+# "cpu", "mem" or "cpu,mem": dump a cProfile / tracemalloc report for the run
+PROFILE_ENV = "PC_EXPORT_PROFILE"
+
+PROFILE_TOP = 40
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where resource is missing)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def child_cpu_seconds():
+    """CPU time of finished child processes (the image normalization pool)."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return round(usage.ru_utime + usage.ru_stime, 3)
+
+
+def _ms(seconds):
+    return round(1000 * seconds, 1) if seconds is not None else None
+
+
+def percentile(sorted_values: list, pct: float):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class RunMetrics:
+    """
+    Per-run measurements: wall + CPU time per phase, bytes extracted/uploaded and
+    upload latencies. Phases are sequential: begin() ends the running phase.
+    record_upload() may be called from worker threads.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._current = None
+        self.bytes_extracted = 0
+        self.bytes_uploaded = 0
+        self.upload_latencies = []
+        self.failed_upload_attempts = 0
+        self._lock = threading.Lock()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def begin(self, name: str):
+        self.end()
+        self._current = (name, time.perf_counter(), time.process_time())
+
+    def end(self):
+        if self._current is None:
+            return
+        name, wall, cpu = self._current
+        self._current = None
+        p = self.phases.setdefault(name, {"wallSeconds": 0.0, "cpuSeconds": 0.0})
+        p["wallSeconds"] = round(p["wallSeconds"] + time.perf_counter() - wall, 3)
+        p["cpuSeconds"] = round(p["cpuSeconds"] + time.process_time() - cpu, 3)
+
+    def record_upload(self, seconds: float, nbytes: int, ok: bool = True):
+        """Every attempt (throttled, failed, retried) counts toward the latencies; bytes only when ok."""
+        with self._lock:
+            self.upload_latencies.append(seconds)
+            if ok:
+                self.bytes_uploaded += nbytes
+            else:
+                self.failed_upload_attempts += 1
+
+    def latency_summary(self) -> dict:
+        lat = sorted(self.upload_latencies)
+        return {
+            "count": len(lat),
+            "p50": _ms(percentile(lat, 50)),
+            "p95": _ms(percentile(lat, 95)),
+            "p99": _ms(percentile(lat, 99)),
+            "max": _ms(lat[-1] if lat else None),
+            "failedAttempts": self.failed_upload_attempts,
+        }
+
+    def summary(self, upload_stats: dict = None) -> dict:
+        upload_stats = upload_stats or {}
+        return {
+            "wallSeconds": round(time.perf_counter() - self._wall_start, 3),
+            "cpuSeconds": round(time.process_time() - self._cpu_start, 3),
+            "childCpuSeconds": child_cpu_seconds(),
+            "peakRssMb": peak_rss_mb(),
+            "phases": self.phases,
+            "bytesExtracted": self.bytes_extracted,
+            "bytesUploaded": self.bytes_uploaded,
+            "uploadLatencyMs": self.latency_summary(),
+            "uploadRetries": upload_stats.get("retries", 0),
+            "uploadThrottled": upload_stats.get("throttled", 0),
+            "uploadFailed": upload_stats.get("failed", 0),
+        }
+
+
+def append_jsonl(path: str, record: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+@contextmanager
+def profiling(out_dir: str, modes: str = None):
+    """
+    Opt-in profiling, driven by PC_EXPORT_PROFILE ("cpu", "mem" or "cpu,mem").
+    cpu: cProfile in the main thread and every thread started inside the block, merged
+         into <out_dir>/export-<ts>.prof plus a top-N text report.
+    mem: tracemalloc top allocation sites and peak, in <out_dir>/export-<ts>.mem.txt.
+    Yields the list of report paths (filled when the block exits).
+    """
+    if modes is None:
+        modes = os.environ.get(PROFILE_ENV, "")
+    modes = {m.strip().lower() for m in modes.split(",")}
+    want_cpu, want_mem = "cpu" in modes, "mem" in modes
+    written = []
+    if not (want_cpu or want_mem):
+        yield written
+        return
+
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, f"export-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    profiles = []
+    profiles_lock = threading.Lock()
+
+    def start_thread_profile(frame, event, arg):
+        prof = cProfile.Profile()
+        with profiles_lock:
+            profiles.append(prof)
+        prof.enable()
+
+    main_prof = cProfile.Profile() if want_cpu else None
+    if want_mem:
+        tracemalloc.start(25)
+    if want_cpu:
+        threading.setprofile(start_thread_profile)
+        main_prof.enable()
+    try:
+        yield written
+    finally:
+        if want_cpu:
+            main_prof.disable()
+            threading.setprofile(None)
+            stats = pstats.Stats(main_prof)
+            for prof in profiles:
+                stats.add(prof)
+            stats.dump_stats(f"{base}.prof")
+            report = io.StringIO()
+            stats.stream = report
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+            stats.sort_stats("tottime").print_stats(PROFILE_TOP)
+            with open(f"{base}.cpu.txt", "w", encoding="utf-8") as f:
+                f.write(report.getvalue())
+            written += [f"{base}.prof", f"{base}.cpu.txt"]
+        if want_mem:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(f"{base}.mem.txt", "w", encoding="utf-8") as f:
+                f.write(f"traced now: {current / 1024 / 1024:.1f} MB, peak: {peak / 1024 / 1024:.1f} MB\n\n")
+                for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+                    f.write(f"{stat}\n")
+            written.append(f"{base}.mem.txt")
@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+
+
+# Sentinel passed down a queue when its producer is finished
+END = None
+
+
+class MonitoredQueue(queue.Queue):
+    """Bounded queue that records its depth on every put (max and average)."""
+
+    def __init__(self, name: str, maxsize: int):
+        super().__init__(maxsize=maxsize)
+        self.name = name
+        self.max_depth = 0
+        self._depth_sum = 0
+        self._puts = 0
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        depth = self.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_sum += depth
+        self._puts += 1
+
+    def avg_depth(self) -> float:
+        return self._depth_sum / self._puts if self._puts else 0.0
+
+    def report(self) -> dict:
+        return {"capacity": self.maxsize, "maxDepth": self.max_depth, "avgDepth": round(self.avg_depth(), 1)}
+
+
+class StageStats:
+    """Items handled, busy time and wall time of one pipeline stage."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started = None
+        self.finished = None
+
+    def add(self, seconds: float, items: int = 1):
+        self.items += items
+        self.busy_seconds += seconds
+
+    def wall_seconds(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def report(self) -> dict:
+        wall = self.wall_seconds()
+        return {
+            "items": self.items,
+            "wallSeconds": round(wall, 3),
+            "busySeconds": round(self.busy_seconds, 3),
+            "itemsPerSecond": round(self.items / wall, 2) if wall > 0 else None,
+        }
+
+
+class Stage(threading.Thread):
+    """
+    Runs target(stats) in a thread. Whatever happens, END is put on each downstream
+    queue when it stops, so later stages never wait forever; an exception is kept
+    in .error and re-raised by join_all().
+    """
+
+    def __init__(self, name: str, target, upstream=None, downstream=()):
+        super().__init__(name=name, daemon=True)
+        self.stats = StageStats(name)
+        self._target_fn = target
+        self.upstream = upstream
+        self._downstream = downstream
+        self.error = None
+
+    def run(self):
+        self.stats.started = time.perf_counter()
+        try:
+            self._target_fn(self.stats)
+        except BaseException as e:  # noqa: B036 - re-raised in join_all
+            self.error = e
+        finally:
+            self.stats.finished = time.perf_counter()
+            for q in self._downstream:
+                q.put(END)
+
+
+def iter_queue(q):
+    """Yield items from q until END."""
+    while True:
+        item = q.get()
+        if item is END:
+            return
+        yield item
+
+
+def join_all(stages):
+    """
+    Wait for every stage, then re-raise the first error. While waiting, the input
+    queue of a failed stage is drained so its producer can't block on a full queue.
+    """
+    while any(stage.is_alive() for stage in stages):
+        for stage in stages:
+            if stage.error is not None and stage.upstream is not None:
+                try:
+                    while True:
+                        stage.upstream.get_nowait()
+                except queue.Empty:
+                    pass
+        for stage in stages:
+            stage.join(timeout=0.1)
+
+    for stage in stages:
+        if stage.error is not None:
+            raise stage.error
+
+
+def format_pipeline_report(stages, queues) -> str:
+    lines = []
+    for st in stages:
+        r = st.report()
+        rate = f"{r['itemsPerSecond']}/s" if r["itemsPerSecond"] is not None else "-"
+        lines.append(
+            f"   {st.name:<12} items={r['items']:<6} rate={rate:<10} "
+            f"busy={r['busySeconds']:.2f}s wall={r['wallSeconds']:.2f}s"
+        )
+    for q in queues:
+        r = q.report()
+        capacity = r["capacity"] or "∞"
+        lines.append(f"   queue {q.name:<6} max={r['maxDepth']}/{capacity} avg={r['avgDepth']}")
+    return "\n".join(lines)
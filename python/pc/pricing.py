@@ -0,0 +1,174 @@
+import os
+import re
+import csv
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from search_index import barcode_key
+
+
+# plan.md, "PRICING FORMULA":
+#   unitCostGBP     = ((packageWeight + productWeight) / 1000) * curiaCost + piecePriceGBP
+#   unitCostBDT     = unitCostGBP * conversionRate
+#   offeredPriceBDT = unitCostBDT * 1.10
+MARGIN = 1.10
+
+PRICES_VERSION = 1
+
+
+def parse_grid(text: str) -> np.ndarray:
+    """'150,155.5' or 'start:stop:step' (stop included) -> float array, e.g. '8:10:0.5'."""
+    text = text.strip()
+    if ":" in text:
+        start, stop, step = (float(v) for v in text.split(":"))
+        if step <= 0 or stop < start:
+            raise ValueError(f"bad grid range: {text}")
+        count = int(round((stop - start) / step)) + 1
+        return np.round(start + step * np.arange(count), 6)
+    return np.array([float(v) for v in text.split(",") if v.strip()])
+
+
+def _to_float(values) -> np.ndarray:
+    """Sheet values (numbers, '£1.25', None) -> float array, NaN where not a number."""
+    out = np.full(len(values), np.nan)
+    for i, v in enumerate(values):
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[i] = v
+        else:
+            text = re.sub(r"[^\d.\-]", "", str(v or ""))
+            try:
+                out[i] = float(text)
+            except ValueError:
+                pass
+    return out
+
+
+def load_master(path: str):
+    """Barcodes (sorted) and piece prices (GBP) from the product master (pc_master.json)."""
+    with open(path, "r", encoding="utf-8") as f:
+        master = json.load(f)
+    columns = master["columns"]
+    return columns["barcode"], _to_float(columns["piecePriceGBP"])
+
+
+def load_weights(path: str) -> dict:
+    """
+    barcode -> (productWeight, packageWeight) in grams, from a CSV with Barcode,
+    ProductWeight and PackageWeight columns (e.g. exported from UK_OrderItems).
+    Header case and spacing are ignored; the last row of a barcode wins.
+    """
+    weights = {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        keys = {re.sub(r"[^a-z]", "", (h or "").lower()): h for h in reader.fieldnames or []}
+        missing = [k for k in ("barcode", "productweight", "packageweight") if k not in keys]
+        if missing:
+            raise ValueError(f"❌ {path}: missing column(s): {', '.join(missing)}")
+        for row in reader:
+            barcode = barcode_key(row[keys["barcode"]])
+            if barcode:
+                product_g, package_g = _to_float([row[keys["productweight"]], row[keys["packageweight"]]])
+                weights[barcode] = (product_g, package_g)
+    return weights
+
+
+def weight_arrays(barcodes: list, weights: dict, default_product_g: float, default_package_g: float):
+    """Per-product weight arrays aligned with barcodes; unknown weights take the defaults."""
+    product_g = np.full(len(barcodes), float(default_product_g))
+    package_g = np.full(len(barcodes), float(default_package_g))
+    known = np.zeros(len(barcodes), dtype=bool)
+    for i, barcode in enumerate(barcodes):
+        w = weights.get(barcode)
+        if w is None:
+            continue
+        if not np.isnan(w[0]):
+            product_g[i] = w[0]
+        if not np.isnan(w[1]):
+            package_g[i] = w[1]
+        known[i] = not (np.isnan(w[0]) or np.isnan(w[1]))
+    return product_g, package_g, known
+
+
+def price_grid(piece_price_gbp: np.ndarray, product_g: np.ndarray, package_g: np.ndarray,
+               conversion_rates: np.ndarray, curia_costs: np.ndarray):
+    """
+    The plan.md formula for every product at every (conversion rate, curia cost) pair in
+    one broadcast pass. Returns (unit cost GBP [products x curia], offered price BDT
+    [rates x curia x products]). Products without a price come out as NaN.
+    """
+    kg = (package_g + product_g) / 1000.0
+    unit_cost_gbp = kg[:, None] * curia_costs[None, :] + piece_price_gbp[:, None]
+    offered_bdt = (unit_cost_gbp.T[None, :, :] * conversion_rates[:, None, None]) * MARGIN
+    return unit_cost_gbp, offered_bdt
+
+
+def _rounded(a: np.ndarray) -> list:
+    """2-decimal JSON arrays, NaN -> null."""
+    return np.where(np.isnan(a), None, np.round(a, 2)).tolist()
+
+
+def build_price_tables(barcodes: list, piece_price_gbp: np.ndarray, product_g: np.ndarray,
+                       package_g: np.ndarray, weight_known: np.ndarray,
+                       conversion_rates: np.ndarray, curia_costs: np.ndarray) -> dict:
+    """
+    Columnar offered-price tables, rows aligned with the (barcode-sorted) master:
+    offeredPriceBDT[r][c][i] is the price of barcodes[i] at conversionRates[r] and
+    curiaCosts[c]; unitCostGBP[c][i] is the cost before conversion.
+    """
+    unit_cost_gbp, offered_bdt = price_grid(piece_price_gbp, product_g, package_g, conversion_rates, curia_costs)
+    return {
+        "version": PRICES_VERSION,
+        "margin": MARGIN,
+        "count": len(barcodes),
+        "missingWeights": int((~weight_known).sum()),
+        "conversionRates": conversion_rates.tolist(),
+        "curiaCosts": curia_costs.tolist(),
+        "barcodes": list(barcodes),
+        "weightKnown": weight_known.tolist(),
+        "unitCostGBP": _rounded(unit_cost_gbp.T),
+        "offeredPriceBDT": _rounded(offered_bdt),
+    }
+
+
+def write_price_tables(path: str, tables: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(tables, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        description="Precompute offered prices (BDT) for the whole catalogue over conversion-rate "
+                    "and curia-cost grids (plan.md pricing formula)."
+    )
+    ap.add_argument("--master", required=True, help="product master written by the exporter (pc_master.json)")
+    ap.add_argument("--weights", help="CSV with Barcode, ProductWeight, PackageWeight (grams)")
+    ap.add_argument("--rates", required=True, help="GBP->BDT conversion rates: '150,152' or '145:160:0.5'")
+    ap.add_argument("--curia-costs", required=True, help="curia cost in GBP per kg: '8,9' or '7:12:0.5'")
+    ap.add_argument("--default-product-weight", type=float, default=0.0, help="grams, when unknown")
+    ap.add_argument("--default-package-weight", type=float, default=0.0, help="grams, when unknown")
+    ap.add_argument("--out", required=True, help="output JSON (e.g. docs/uk/data/pc_prices.json)")
+    args = ap.parse_args(argv)
+
+    barcodes, piece_price_gbp = load_master(args.master)
+    weights = load_weights(args.weights) if args.weights else {}
+    product_g, package_g, known = weight_arrays(
+        barcodes, weights, args.default_product_weight, args.default_package_weight
+    )
+    rates, curia_costs = parse_grid(args.rates), parse_grid(args.curia_costs)
+
+    tables = build_price_tables(barcodes, piece_price_gbp, product_g, package_g, known, rates, curia_costs)
+    write_price_tables(args.out, tables)
+    print(
+        f"💷 Priced {tables['count']} product(s) x {len(rates)} rate(s) x {len(curia_costs)} curia cost(s) "
+        f"-> {args.out} (missing weights: {tables['missingWeights']})"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
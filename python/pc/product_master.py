@@ -0,0 +1,79 @@
+import os
+import json
+
+from search_index import barcode_key
+
+
+MASTER_VERSION = 1
+
+# Column name in the master -> product field (normalized header, or a field the exporter adds).
+# Names follow the UK_OrderItems columns filled "From JSON" (see plan.md).
+MASTER_COLUMNS = {
+    "barcode": "barcode",
+    "brand": "brand",
+    "description": "name",
+    "piecePriceGBP": "price",
+    "innerCase": "case_size",
+    "imageUrl": "imageUrl",
+}
+
+
+def build_master(products, field_names: dict, source_file: str) -> dict:
+    """
+    Columnar product master for the Apps Script ordering backend: one array per column,
+    rows sorted by barcode so ProductMaster.gs can binary-search the barcode column.
+    Brands are dictionary-encoded (brand column holds indexes into "brands").
+    field_names maps MASTER_COLUMNS values to the header names in the rows (None = missing).
+    Rows without a barcode are skipped; for duplicate barcodes the first row in the sheet wins.
+    products is read once and only the master columns of each row are kept.
+    """
+    headers = {name: field_names.get(field) for name, field in MASTER_COLUMNS.items()}
+    rows = {}
+    duplicates = 0
+    for p in products:
+        barcode = barcode_key(p.get(field_names["barcode"]))
+        if not barcode:
+            continue
+        if barcode in rows:
+            duplicates += 1
+            continue
+        rows[barcode] = [p.get(header) if header else None for header in headers.values()]
+
+    brands = []
+    brand_idx = {}
+    columns = {name: [] for name in MASTER_COLUMNS}
+    for barcode in sorted(rows):
+        for name, value in zip(headers, rows[barcode]):
+            if name == "barcode":
+                value = barcode
+            elif name == "brand":
+                value = str(value or "").strip()
+                if value not in brand_idx:
+                    brand_idx[value] = len(brands)
+                    brands.append(value)
+                value = brand_idx[value]
+            columns[name].append(value)
+
+    return {
+        "version": MASTER_VERSION,
+        "sourceFile": source_file,
+        "count": len(rows),
+        "duplicateBarcodes": duplicates,
+        "brands": brands,
+        "columns": columns,
+    }
+
+
+def write_master(path: str, master: dict) -> bool:
+    """Write compact JSON; returns False (and leaves the file alone) when nothing changed."""
+    data = json.dumps(master, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
@@ -0,0 +1,75 @@
+from collections.abc import Mapping
+
+
+# Fields the exporter adds after the sheet columns, in output order
+EXTRA_FIELDS = ("_rowNumber", "product_id", "imageUrl")
+
+
+class RecordSchema:
+    """
+    Field layout shared by every record of one sheet, compiled once from the header row.
+    Keys keep dict semantics: a repeated header appears once, at its first position,
+    with the value of its last column; EXTRA_FIELDS replace sheet columns of the same name.
+    """
+
+    def __init__(self, headers: list):
+        # key -> column index, or the name of a record attribute for EXTRA_FIELDS
+        self.source = {}
+        for i, h in enumerate(headers):
+            self.source[h] = i  # like dict(zip(...)): first position, last value
+        self.source.update({"_rowNumber": "row", "product_id": "product_id", "imageUrl": "image_url"})
+        self.keys = tuple(self.source)
+
+
+class ProductRecord(Mapping):
+    """
+    One product row: the raw cell values as a tuple plus the fields the exporter adds,
+    read through the shared schema. Reads like the dict the JSON gets (get, [], keys,
+    iteration), so the side artifacts take records as they are; json_default() turns a
+    record into that dict only while it is being serialized.
+    """
+
+    __slots__ = ("schema", "values", "row", "product_id", "image_url")
+
+    def __init__(self, schema: RecordSchema, values: tuple, row: int):
+        self.schema = schema
+        self.values = values
+        self.row = row
+        self.product_id = None
+        self.image_url = None
+
+    def __getitem__(self, key):
+        src = self.schema.source[key]
+        if src.__class__ is int:
+            return self.values[src] if src < len(self.values) else None
+        return getattr(self, src)
+
+    def get(self, key, default=None):
+        src = self.schema.source.get(key)
+        if src is None:
+            return default
+        if src.__class__ is int:
+            return self.values[src] if src < len(self.values) else None
+        return getattr(self, src)
+
+    def __iter__(self):
+        return iter(self.schema.keys)
+
+    def __len__(self):
+        return len(self.schema.keys)
+
+    def __contains__(self, key):
+        return key in self.schema.source
+
+    def to_dict(self) -> dict:
+        return {k: self[k] for k in self.schema.keys}
+
+    def __repr__(self):
+        return f"ProductRecord({self.to_dict()!r})"
+
+
+def json_default(obj):
+    """json.dump(..., default=json_default) writes records as the product dicts."""
+    if isinstance(obj, ProductRecord):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
@@ -0,0 +1,149 @@
+import os
+import re
+import json
+from bisect import insort
+from datetime import datetime
+
+
+INDEX_VERSION = 1
+
+# Type-ahead buckets are keyed by the first PREFIX_LEN characters of each term
+PREFIX_LEN = 2
+
+# Rebuild from scratch once this share of slots are tombstones (removed products)
+MAX_TOMBSTONE_RATIO = 0.25
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text) -> list:
+    """'AUSSIE 350ML CONDITIONER' -> ['aussie', '350ml', 'conditioner'] (unique, in order)."""
+    return list(dict.fromkeys(_TOKEN_RE.findall(str(text or "").lower())))
+
+
+def barcode_key(value) -> str:
+    """Barcodes come out of Excel as str, int or float; index them as digit strings."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() if value is not None else ""
+
+
+def _doc_keys(product: dict, fields: dict):
+    brand = str(product.get(fields["brand"]) or "").strip().lower() if fields.get("brand") else ""
+    terms = tokenize(product.get(fields["name"]))
+    terms += [t for t in tokenize(brand) if t not in terms]
+    return terms, brand, barcode_key(product.get(fields["barcode"]))
+
+
+def _add(index: dict, slot: int, product: dict):
+    terms, brand, barcode = _doc_keys(product, index["fields"])
+    for t in terms:
+        insort(index["terms"].setdefault(t, []), slot)
+    if brand:
+        insort(index["brands"].setdefault(brand, []), slot)
+    if barcode:
+        insort(index["barcodes"].setdefault(barcode, []), slot)
+
+
+def _remove(index: dict, slot: int, product: dict):
+    terms, brand, barcode = _doc_keys(product, index["fields"])
+    for table, keys in (("terms", terms), ("brands", [brand]), ("barcodes", [barcode])):
+        for key in keys:
+            postings = index[table].get(key)
+            if postings and slot in postings:
+                postings.remove(slot)
+                if not postings:
+                    del index[table][key]
+
+
+def _prefix_buckets(terms: dict) -> dict:
+    buckets = {}
+    for t in sorted(terms):
+        buckets.setdefault(t[:PREFIX_LEN], []).append(t)
+    return buckets
+
+
+def build_index(products: list, fields: dict) -> dict:
+    """
+    Full build. fields maps "name"/"barcode"/"brand" to the header names in the rows.
+    Postings hold slots: positions in index["ids"] (product_id per slot, None = removed).
+    """
+    index = {
+        "version": INDEX_VERSION,
+        "fields": fields,
+        "ids": [],
+        "terms": {},
+        "brands": {},
+        "barcodes": {},
+    }
+    for slot, p in enumerate(products):
+        index["ids"].append(p.get("product_id"))
+        _add(index, slot, p)
+    return index
+
+
+def update_index(index: dict, delta: dict, prev_by_id: dict, cur_by_id: dict) -> bool:
+    """
+    Apply an incremental.diff_products() delta in place: removed products become
+    tombstone slots, added products get new slots, and changed products are re-indexed
+    only when name, brand or barcode changed. Returns False when the index has to be
+    rebuilt instead (too many tombstones).
+    """
+    slot_by_id = {pid: slot for slot, pid in enumerate(index["ids"]) if pid is not None}
+
+    for pid in delta["removed"]:
+        slot = slot_by_id.pop(pid, None)
+        if slot is not None:
+            _remove(index, slot, prev_by_id[pid])
+            index["ids"][slot] = None
+
+    fields = index["fields"]
+    for entry in delta["changed"]:
+        pid = entry["product_id"]
+        old, new = prev_by_id[pid], cur_by_id[pid]
+        if _doc_keys(old, fields) == _doc_keys(new, fields):
+            continue
+        _remove(index, slot_by_id[pid], old)
+        _add(index, slot_by_id[pid], new)
+
+    for p in delta["added"]:
+        slot = len(index["ids"])
+        index["ids"].append(p.get("product_id"))
+        _add(index, slot, p)
+
+    tombstones = index["ids"].count(None)
+    return tombstones <= MAX_TOMBSTONE_RATIO * max(1, len(index["ids"]))
+
+
+def load_index(path: str):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != INDEX_VERSION:
+        return None
+    return index
+
+
+def index_matches(index, fields: dict, prev_ids) -> bool:
+    """True if index was built with the same fields over exactly the products in prev_ids."""
+    if not index or index.get("fields") != fields:
+        return False
+    return {pid for pid in index["ids"] if pid is not None} == set(prev_ids)
+
+
+def write_index(path: str, index: dict, meta: dict):
+    out = dict(index)
+    out["generatedAt"] = datetime.utcnow().isoformat() + "Z"
+    out["sourceFile"] = meta.get("sourceFile")
+    out["count"] = len(index["ids"]) - index["ids"].count(None)
+    out["prefixLength"] = PREFIX_LEN
+    out["prefixes"] = _prefix_buckets(index["terms"])
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(out, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
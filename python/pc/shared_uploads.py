@@ -0,0 +1,51 @@
+import time
+
+
+# How often a worker checks whether an image claimed by another worker is uploaded
+POLL_SECONDS = 0.2
+
+
+def _key(folder_id: str, digest: str) -> str:
+    return f"{folder_id}:{digest}"
+
+
+def claim(registry, folder_id: str, digest: str, owner: str) -> bool:
+    """
+    Claim the upload of this image content for one batch worker.
+    registry is a multiprocessing Manager dict shared by all workers; setdefault runs in
+    the manager process, so exactly one worker gets True per (folder, digest).
+    """
+    entry = registry.setdefault(_key(folder_id, digest), {"owner": owner, "state": "pending"})
+    return entry["owner"] == owner
+
+
+def publish(registry, folder_id: str, digest: str, owner: str, file_id: str = None, url: str = None):
+    """Owner reports the upload result (no url = failed) so waiting workers can continue."""
+    registry[_key(folder_id, digest)] = {
+        "owner": owner,
+        "state": "done" if url else "failed",
+        "fileId": file_id,
+        "url": url,
+    }
+
+
+def wait_for(registry, folder_id: str, digests, timeout: float):
+    """
+    Yield (digest, entry) as uploads claimed by other workers finish; entry["state"] is
+    "done" or "failed". Digests still pending after timeout are yielded with None.
+    """
+    pending = set(digests)
+    deadline = time.monotonic() + timeout
+    while pending:
+        for digest in list(pending):
+            entry = registry.get(_key(folder_id, digest))
+            if entry is not None and entry["state"] != "pending":
+                pending.discard(digest)
+                yield digest, entry
+        if not pending:
+            return
+        if time.monotonic() > deadline:
+            for digest in pending:
+                yield digest, None
+            return
+        time.sleep(POLL_SECONDS)
@@ -0,0 +1,209 @@
+import io
+import os
+import json
+
+from product_record import json_default
+
+
+# The meta slot is sized from the final meta's shape with every number (or null) as wide
+# as NUMBER_PLACEHOLDER, plus META_SLACK_BYTES. A meta that still outgrows it is written
+# by copying the products once into a new temp file.
+NUMBER_PLACEHOLDER = 9999.999
+META_SLACK_BYTES = 64
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+class _JsonStream:
+    """Reads JSON values one at a time from a text file, through a buffer of about chunk_size."""
+
+    def __init__(self, f, chunk_size: int = COPY_CHUNK_BYTES):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+
+    def _more(self) -> bool:
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """The next non-whitespace character ("" at the end of the file)."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf) or not self._more():
+                return self._buf[self._pos:self._pos + 1]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} in the snapshot")
+        self._pos += 1
+
+    def value(self):
+        """The next value; objects and strings are complete only once their closing character is read."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if not self._more():
+                    raise
+                continue
+            self._pos = end
+            return value
+
+
+def _iter_items(stream: _JsonStream, count: int = None):
+    """The items of the array whose "[" was just read (at most count of them)."""
+    n = 0
+    while n != count:
+        if stream.peek() == "]":
+            return
+        if n:
+            stream.expect(",")
+        yield stream.value()
+        n += 1
+
+
+class SnapshotProducts:
+    """
+    Re-iterable products of a snapshot file: every pass reads them back one at a time,
+    so a whole catalogue is never in memory. offset/count point at the products a
+    SnapshotWriter has written so far; without them the file is read from the start.
+    """
+
+    def __init__(self, path: str, offset: int = None, count: int = None):
+        self.path = path
+        self._offset = offset
+        self._count = count
+
+    def __len__(self):
+        if self._count is None:
+            raise TypeError("product count of a published snapshot is unknown")
+        return self._count
+
+    def __iter__(self):
+        with open(self.path, "rb") as raw:
+            if self._offset is not None:
+                raw.seek(self._offset)
+            stream = _JsonStream(io.TextIOWrapper(raw, encoding="utf-8"))
+            if self._offset is None:
+                _read_meta(stream)
+            yield from _iter_items(stream, self._count)
+
+
+def _read_meta(stream: _JsonStream) -> dict:
+    """Read up to the opening "[" of the products; the meta must come first."""
+    stream.expect("{")
+    if stream.value() != "meta":
+        raise ValueError("snapshot does not start with its meta")
+    stream.expect(":")
+    meta = stream.value()
+    stream.expect(",")
+    if stream.value() != "products":
+        raise ValueError("snapshot has no products after its meta")
+    stream.expect(":")
+    stream.expect("[")
+    return meta
+
+
+def read_snapshot(path: str):
+    """
+    (meta, products) of a published pc_data.json without loading its products:
+    products is a SnapshotProducts. Raises OSError / ValueError for a missing or
+    unreadable file.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        meta = _read_meta(_JsonStream(f))
+    if not isinstance(meta, dict):
+        raise ValueError("snapshot meta is not an object")
+    return meta, SnapshotProducts(path)
+
+
+def _widened(obj):
+    if isinstance(obj, dict):
+        return {k: _widened(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_widened(v) for v in obj]
+    if obj is None or (isinstance(obj, (int, float)) and not isinstance(obj, bool)):
+        return NUMBER_PLACEHOLDER
+    return obj
+
+
+class SnapshotWriter:
+    """
+    Writes pc_data.json ({"meta": ..., "products": [...]}, laid out like json.dump(indent=2))
+    one product at a time to <path>.tmp. The meta goes first as a whitespace-padded
+    placeholder; finish() patches the final meta in place and renames the temp file
+    over path, so readers only ever see a complete snapshot. meta_shape has the keys
+    (and nested sections) of the final meta; its values only size the placeholder.
+    """
+
+    def __init__(self, path: str, meta_shape: dict):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.count = 0
+        self._encoder = json.JSONEncoder(ensure_ascii=False, indent=2, default=json_default)
+        self._f = open(self.tmp_path, "wb")
+        self._f.write(b'{\n  "meta": ')
+        self._meta_offset = self._f.tell()
+        self._meta_room = len(self._encode(_widened(meta_shape), 1)) + META_SLACK_BYTES
+        self._f.write(b" " * self._meta_room)
+        self._f.write(b',\n  "products": [')
+        self._products_offset = self._f.tell()
+
+    def _encode(self, obj, level: int) -> bytes:
+        # JSON strings never hold a raw newline, so re-indenting every line is safe
+        return self._encoder.encode(obj).replace("\n", "\n" + "  " * level).encode("utf-8")
+
+    def write_product(self, record):
+        self._f.write(b"\n    " if self.count == 0 else b",\n    ")
+        self._f.write(self._encode(record, 2))
+        self.count += 1
+
+    def products(self) -> SnapshotProducts:
+        """The products written so far, read back from the temp file on every pass."""
+        self._f.flush()
+        return SnapshotProducts(self.tmp_path, self._products_offset, self.count)
+
+    def finish(self, meta: dict):
+        """Close the products list, write the final meta and publish the file."""
+        self._f.write(b"\n  ]\n}" if self.count else b"]\n}")
+        meta_bytes = self._encode(meta, 1)
+        if len(meta_bytes) <= self._meta_room:
+            self._f.seek(self._meta_offset)
+            self._f.write(meta_bytes + b" " * (self._meta_room - len(meta_bytes)))
+            f = self._f
+        else:
+            f = self._rewrite(meta_bytes)
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def _rewrite(self, meta_bytes: bytes):
+        """The final meta does not fit its placeholder: copy the products after it."""
+        self._f.close()
+        old_path = f"{self.tmp_path}.old"
+        os.replace(self.tmp_path, old_path)
+        f = open(self.tmp_path, "wb")
+        f.write(b'{\n  "meta": ' + meta_bytes)
+        with open(old_path, "rb") as old:
+            old.seek(self._meta_offset + self._meta_room)
+            while True:
+                chunk = old.read(COPY_CHUNK_BYTES)
+                if not chunk:
+                    break
+                f.write(chunk)
+        os.remove(old_path)
+        return f
+
+    def discard(self):
+        """Drop the temp file and leave path as it was."""
+        self._f.close()
+        os.remove(self.tmp_path)
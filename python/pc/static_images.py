@@ -0,0 +1,42 @@
+import os
+from urllib.parse import urlparse
+
+
+# Hex digits of the sha256 used in file names (64 bits: no collisions at catalogue scale)
+NAME_DIGITS = 16
+
+
+def target_key(base_url: str) -> str:
+    """Upload manifest "folderId" for images published under base_url (instead of a Drive folder)."""
+    return f"static:{base_url}"
+
+
+def is_absolute_url(base_url: str) -> bool:
+    """imageUrl values copied out of the site (product master -> UK_OrderItems) need scheme and host."""
+    parsed = urlparse(base_url or "")
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+
+
+def image_name(digest: str, ext: str) -> str:
+    return f"{digest[:NAME_DIGITS]}.{ext}"
+
+
+def publish_image(out_dir: str, base_url: str, digest: str, ext: str, data: bytes):
+    """
+    Write the image as <out_dir>/<sha256 prefix>.<ext> and return (name, url).
+    A name always holds the same bytes, so existing files are left alone and the
+    site can serve them with a far-future cache lifetime.
+    """
+    name = image_name(digest, ext)
+    path = os.path.join(out_dir, name)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.tmp.{os.getpid()}.{id(data)}"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return name, base_url + name
+
+
+def missing_images(out_dir: str, names: list) -> set:
+    """Published names whose file is gone from out_dir (e.g. the folder was cleaned)."""
+    return {name for name in names if not os.path.exists(os.path.join(out_dir, name))}
@@ -0,0 +1,218 @@
+import os
+import re
+import csv
+import sys
+import json
+import math
+import argparse
+
+from search_index import barcode_key
+
+
+# Packing / procurement list columns (product details come from the catalogue)
+DETAIL_FIELDS = ["brand", "description", "productCode", "innerCase", "piecePriceGBP", "imageUrl"]
+
+# catalogue field -> normalized pc_data.json header (see normalize_header in export_pc_data.py)
+CATALOGUE_FIELDS = {
+    "brand": "brand",
+    "description": "name",
+    "productCode": "product_code",
+    "innerCase": "case_size",
+    "piecePriceGBP": "price",
+}
+
+# The same details as UK_OrderItems columns ("From JSON"), used for barcodes the catalogue lacks
+ITEM_DETAIL_COLUMNS = {
+    "brand": "brand",
+    "description": "description",
+    "innerCase": "innercase",
+    "piecePriceGBP": "piecepricegbp",
+    "imageUrl": "imageurl",
+}
+
+DEFAULT_EXCLUDE_STATUSES = "cancelled,draft"
+
+
+def _key(header) -> str:
+    """Sheet export headers: 'StockListId', 'Stock List ID' and 'stock_list_id' are the same column."""
+    return re.sub(r"[^a-z0-9]", "", str(header or "").lower())
+
+
+def _number(value):
+    text = re.sub(r"[^\d.\-]", "", str(value if value is not None else ""))
+    try:
+        n = float(text)
+    except ValueError:
+        return 0
+    return int(n) if n.is_integer() else n
+
+
+def _csv_rows(path: str):
+    """Stream a CSV export as dicts with normalized keys."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = [_key(h) for h in next(reader, [])]
+        for row in reader:
+            yield dict(zip(header, row))
+
+
+def load_catalogue(path: str) -> dict:
+    """barcode -> product details from pc_data.json (first row of a barcode wins, as in the master)."""
+    with open(path, "r", encoding="utf-8") as f:
+        products = json.load(f)["products"]
+    index = {}
+    for p in products:
+        fields = {re.sub(r"[\s\-]+", "_", str(k).strip().lower()): v for k, v in p.items()}
+        barcode = barcode_key(fields.get("barcode"))
+        if not barcode or barcode in index:
+            continue
+        details = {name: fields.get(header) for name, header in CATALOGUE_FIELDS.items()}
+        details["imageUrl"] = p.get("imageUrl")
+        index[barcode] = details
+    return index
+
+
+def stock_list_by_order(orders_csv: str, exclude_statuses: set) -> dict:
+    """OrderId -> StockListId for orders assigned to a stock list (UK_Orders export)."""
+    mapping = {}
+    for row in _csv_rows(orders_csv):
+        stock_list = (row.get("stocklistid") or "").strip()
+        if not stock_list or (row.get("status") or "").strip().lower() in exclude_statuses:
+            continue
+        mapping[(row.get("orderid") or "").strip()] = stock_list
+    return mapping
+
+
+def aggregate_items(rows, order_stock_lists: dict = None) -> dict:
+    """
+    One pass over UK_OrderItems rows: (StockListId, barcode) -> combined ordered / shipped
+    quantities, line count and order ids. The stock list comes from order_stock_lists
+    (OrderId -> StockListId, already filtered by status) if given, else from the row's
+    own StockListId column; rows without one are skipped.
+    """
+    groups = {}
+    for row in rows:
+        order_id = (row.get("orderid") or "").strip()
+        if order_stock_lists is not None:
+            stock_list = order_stock_lists.get(order_id, "")
+        else:
+            stock_list = (row.get("stocklistid") or "").strip()
+        barcode = barcode_key((row.get("barcode") or "").strip())
+        if not stock_list or not barcode:
+            continue
+        g = groups.get((stock_list, barcode))
+        if g is None:
+            g = groups[(stock_list, barcode)] = {
+                "ordered": 0, "shipped": 0, "lines": 0, "orders": set(),
+                "itemDetails": {name: row.get(col) for name, col in ITEM_DETAIL_COLUMNS.items()},
+            }
+        g["ordered"] += _number(row.get("orderedquantity"))
+        g["shipped"] += _number(row.get("shippedquantity"))
+        g["lines"] += 1
+        g["orders"].add(order_id)
+    return groups
+
+
+def build_lists(groups: dict, catalogue: dict) -> dict:
+    """
+    StockListId -> {"packing": [...], "procurement": [...]}, joined to the catalogue by barcode.
+    Packing: what each barcode ships (shipped, still to ship). Procurement: ordered quantity
+    in whole cases of innerCase and its estimated GBP cost. Both sorted by brand, description.
+    """
+    lists = {}
+    for (stock_list, barcode), g in groups.items():
+        details = catalogue.get(barcode)
+        found = details is not None
+        if details is None:
+            details = g["itemDetails"]
+        details = {name: details.get(name) for name in DETAIL_FIELDS}
+
+        ordered, shipped = g["ordered"], g["shipped"]
+        inner_case = _number(details["innerCase"]) or 1
+        price = _number(details["piecePriceGBP"])
+        cases = math.ceil(ordered / inner_case) if ordered > 0 else 0
+        base = {"barcode": barcode, **details, "inCatalogue": found}
+
+        out = lists.setdefault(stock_list, {"packing": [], "procurement": []})
+        out["packing"].append({
+            **base,
+            "orderedQuantity": ordered,
+            "shippedQuantity": shipped,
+            "toShip": max(ordered - shipped, 0),
+            "orders": len(g["orders"]),
+            "lines": g["lines"],
+        })
+        out["procurement"].append({
+            **base,
+            "orderedQuantity": ordered,
+            "cases": cases,
+            "procureQuantity": cases * inner_case,
+            "estimatedCostGBP": round(cases * inner_case * price, 2),
+        })
+
+    for out in lists.values():
+        for rows in out.values():
+            rows.sort(key=lambda r: (str(r["brand"] or "").lower(), str(r["description"] or "").lower(), r["barcode"]))
+    return lists
+
+
+def safe_name(s: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", s).strip("_") or "stock_list"
+
+
+def write_lists(out_dir: str, lists: dict) -> dict:
+    """<out_dir>/<StockListId>.packing.csv and .procurement.csv per stock list, plus stock_lists.json."""
+    os.makedirs(out_dir, exist_ok=True)
+    summary = {}
+    for stock_list in sorted(lists):
+        files = {}
+        for kind, rows in lists[stock_list].items():
+            path = os.path.join(out_dir, f"{safe_name(stock_list)}.{kind}.csv")
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+            files[kind] = os.path.basename(path)
+        procurement = lists[stock_list]["procurement"]
+        summary[stock_list] = {
+            "barcodes": len(procurement),
+            "orderedQuantity": sum(r["orderedQuantity"] for r in procurement),
+            "cases": sum(r["cases"] for r in procurement),
+            "estimatedCostGBP": round(sum(r["estimatedCostGBP"] for r in procurement), 2),
+            "notInCatalogue": sum(1 for r in procurement if not r["inCatalogue"]),
+            "files": files,
+        }
+    with open(os.path.join(out_dir, "stock_lists.json"), "w", encoding="utf-8") as f:
+        json.dump({"stockLists": summary, "lists": lists}, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        description="Packing and procurement lists for every StockListId from UK_OrderItems / UK_Orders CSV exports."
+    )
+    ap.add_argument("--items", required=True, help="UK_OrderItems CSV export")
+    ap.add_argument("--orders", help="UK_Orders CSV export (OrderId -> StockListId), unless items carry StockListId")
+    ap.add_argument("--catalogue", required=True, help="pc_data.json written by the exporter")
+    ap.add_argument("--exclude-status", default=DEFAULT_EXCLUDE_STATUSES,
+                    help=f"order statuses left out (default: {DEFAULT_EXCLUDE_STATUSES})")
+    ap.add_argument("--out-dir", required=True)
+    args = ap.parse_args(argv)
+
+    excluded = {s.strip().lower() for s in args.exclude_status.split(",") if s.strip()}
+    order_stock_lists = stock_list_by_order(args.orders, excluded) if args.orders else None
+    groups = aggregate_items(_csv_rows(args.items), order_stock_lists)
+    lists = build_lists(groups, load_catalogue(args.catalogue))
+    summary = write_lists(args.out_dir, lists)
+
+    for stock_list, s in summary.items():
+        print(
+            f"📦 {stock_list}: {s['barcodes']} barcode(s), ordered={s['orderedQuantity']}, cases={s['cases']}, "
+            f"est. £{s['estimatedCostGBP']:.2f}"
+            + (f", not in catalogue: {s['notInCatalogue']}" if s["notInCatalogue"] else "")
+        )
+    print(f"✅ {len(summary)} stock list(s) -> {args.out_dir}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
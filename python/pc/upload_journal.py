@@ -0,0 +1,96 @@
+import os
+import glob
+import json
+import hashlib
+import threading
+
+import upload_manifest
+
+
+def journal_path(journal_dir: str, out_json_path: str) -> str:
+    """One journal per export target, so batch jobs never write the same file."""
+    stem = os.path.splitext(os.path.basename(out_json_path))[0]
+    key = hashlib.sha1(os.path.abspath(out_json_path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(journal_dir, f"{stem}-{key}.jsonl")
+
+
+class UploadJournal:
+    """
+    Append-only log of finished uploads, one JSON line each, fsynced before append()
+    returns: a run that dies half way keeps everything it uploaded. The manifest is
+    only saved at the end of a run; once it is, the journal is no longer needed.
+    """
+
+    def __init__(self, path: str, keep: bool = False):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND | (0 if keep else os.O_TRUNC)
+        self._fd = os.open(path, flags, 0o644)
+        self._lock = threading.Lock()
+
+    def append(self, row: int, digest: str, folder_id: str, file_id: str, url: str, name: str, signature: str,
+               dhash: str = None, alias_of: str = None, alias_distance: int = None):
+        line = json.dumps(
+            {"row": row, "sha256": digest, "folderId": folder_id, "fileId": file_id,
+             "url": url, "name": name, "signature": signature, "dhash": dhash,
+             "aliasOf": alias_of, "aliasDistance": alias_distance},
+            ensure_ascii=False, separators=(",", ":"),
+        ) + "\n"
+        with self._lock:
+            os.write(self._fd, line.encode("utf-8"))
+            os.fsync(self._fd)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def discard(self):
+        """Drop the journal after its entries have reached the saved manifest."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def read_journal(path: str):
+    """Yield journal entries; a line cut off by a crash (the last one) is skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and entry.get("sha256") and entry.get("url"):
+                yield entry
+
+
+def load_journals(journal_dir: str) -> list:
+    """
+    Entries of every journal in journal_dir (interrupted runs of any job). Read these
+    before loading the manifest: a run that finishes in between saves the manifest
+    before it drops its journal, so its uploads are always found in one or the other.
+    """
+    entries = []
+    for path in sorted(glob.glob(os.path.join(journal_dir, "*.jsonl"))):
+        entries += read_journal(path)
+    return entries
+
+
+def replay(entries: list, manifest: dict) -> int:
+    """
+    Record journaled uploads in the manifest, with their zip signatures, so the resumed
+    run skips those images. Returns the number of uploads the manifest did not have.
+    """
+    recovered = 0
+    for entry in entries:
+        known = manifest.get(entry["sha256"])
+        if known and known.get("fileId") == entry["fileId"]:
+            upload_manifest.add_signature(manifest, entry["sha256"], entry["signature"])
+            continue
+        upload_manifest.record(
+            manifest, entry["sha256"], entry["folderId"], entry["fileId"], entry["url"],
+            entry["name"], signature=entry["signature"], dhash=entry.get("dhash"),
+            alias_of=entry.get("aliasOf"), alias_distance=entry.get("aliasDistance"),
+        )
+        recovered += 1
+    return recovered
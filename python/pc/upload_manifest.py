@@ -0,0 +1,117 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_manifest(path: str) -> dict:
+    """
+    Load the upload manifest: {sha256: {fileId, url, folderId, name, uploadedAt}}.
+    Missing or unreadable file -> empty manifest (everything is uploaded again).
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get("images", {}) if isinstance(data, dict) else {}
+
+
+def save_manifest(path: str, manifest: dict):
+    """Write the manifest atomically (temp file + rename)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "images": manifest}, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def merge_and_save(path: str, manifest: dict):
+    """
+    Save a manifest that other processes also write (batch mode, caller holds the lock):
+    entries they added since we loaded are kept, signatures of shared entries are merged.
+    """
+    for digest, entry in load_manifest(path).items():
+        mine = manifest.get(digest)
+        if mine is None:
+            manifest[digest] = entry
+        elif mine.get("fileId") == entry.get("fileId"):
+            for sig in entry.get("signatures", []):
+                add_signature(manifest, digest, sig)
+    save_manifest(path, manifest)
+
+
+def alias_allowed(entry: dict, near_distance: int = None) -> bool:
+    """
+    Entries pointing a near-duplicate at another image's file ("aliasOf") only count
+    while near-duplicate matching is on with at least their dHash distance; otherwise
+    the image is uploaded on its own (and its entry replaced).
+    """
+    if not entry.get("aliasOf"):
+        return True
+    return near_distance is not None and entry.get("aliasDistance", near_distance + 1) <= near_distance
+
+
+def lookup(manifest: dict, digest: str, folder_id: str, near_distance: int = None):
+    """Return the cached entry for this image content in this Drive folder, or None."""
+    entry = manifest.get(digest)
+    if entry and entry.get("folderId") == folder_id and entry.get("url") and alias_allowed(entry, near_distance):
+        return entry
+    return None
+
+
+def record(manifest: dict, digest: str, folder_id: str, file_id: str, url: str, name: str, signature: str = None,
+           dhash: str = None, alias_of: str = None, alias_distance: int = None):
+    manifest[digest] = {
+        "fileId": file_id,
+        "url": url,
+        "folderId": folder_id,
+        "name": name,
+        "uploadedAt": datetime.utcnow().isoformat() + "Z",
+        "signatures": [signature] if signature else [],
+    }
+    if dhash:
+        manifest[digest]["dhash"] = dhash  # perceptual hash (hex), for near-duplicate matching
+    if alias_of:
+        # not uploaded itself: shares the file of alias_of, alias_distance dHash bits away
+        manifest[digest]["aliasOf"] = alias_of
+        manifest[digest]["aliasDistance"] = alias_distance
+
+
+def add_signature(manifest: dict, digest: str, signature: str):
+    """Remember a cheap zip signature (crc32-size) for already-known content."""
+    entry = manifest.get(digest)
+    if entry is None or not signature:
+        return
+    sigs = entry.setdefault("signatures", [])
+    if signature not in sigs:
+        sigs.append(signature)
+
+
+def signature_index(manifest: dict, folder_id: str, near_distance: int = None) -> dict:
+    """signature -> manifest entry, for entries uploaded into folder_id (aliases: see alias_allowed)."""
+    index = {}
+    for entry in manifest.values():
+        if entry.get("folderId") != folder_id or not entry.get("url") or not alias_allowed(entry, near_distance):
+            continue
+        for sig in entry.get("signatures", []):
+            index[sig] = entry
+    return index
+
+
+def folder_file_ids(manifest: dict, folder_id: str) -> list:
+    return [e["fileId"] for e in manifest.values() if e.get("folderId") == folder_id and e.get("fileId")]
+
+
+def drop_file_ids(manifest: dict, file_ids: set) -> int:
+    """Forget entries whose Drive file is gone; returns how many were dropped."""
+    dead = [digest for digest, e in manifest.items() if e.get("fileId") in file_ids]
+    for digest in dead:
+        del manifest[digest]
+    return len(dead)
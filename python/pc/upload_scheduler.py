@@ -0,0 +1,194 @@
+import heapq
+import itertools
+import queue
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from googleapiclient.errors import HttpError
+
+
+# How often the dispatcher looks for new items from a queue source while uploads run
+QUEUE_POLL_SECONDS = 0.05
+
+RATE_LIMIT_MARKERS = ("ratelimitexceeded", "userratelimitexceeded", "quotaexceeded")
+
+
+def classify_error(exc: Exception) -> str:
+    """
+    "throttle" -> Drive asked us to slow down (429, 403 rateLimitExceeded): back off + lower concurrency
+    "retry"    -> transient (5xx, timeouts, connection resets): back off and try again
+    "fatal"    -> retrying will not help (other 4xx, missing local file)
+    """
+    if isinstance(exc, HttpError):
+        status = int(getattr(exc.resp, "status", 0) or 0)
+        if status == 429:
+            return "throttle"
+        if status == 403:
+            details = f"{exc.error_details} {exc.content!r}".lower()
+            return "throttle" if any(m in details for m in RATE_LIMIT_MARKERS) else "fatal"
+        if status == 408 or status >= 500:
+            return "retry"
+        return "fatal"
+    if isinstance(exc, (FileNotFoundError, PermissionError, IsADirectoryError)):
+        return "fatal"
+    return "retry"
+
+
+class AdaptiveUploader:
+    """
+    Runs upload_fn(item) on a thread pool with a concurrency limit that follows Drive:
+    - additive increase: +1 after `limit` clean successes while latency stays near its baseline
+    - multiplicative decrease: halve on 403/429 rate-limit responses, -1 when latency doubles
+    - failed items are re-queued with exponential backoff + full jitter until their attempts
+      or the run's shared retry budget are used up
+    Results are reported through on_result(item, result, error) on the calling thread.
+
+    items is a list/iterable, or a queue.Queue fed by another thread and closed with None,
+    so uploads can start while the producer is still working.
+    """
+
+    def __init__(
+        self,
+        upload_fn,
+        start_workers: int = 6,
+        min_workers: int = 1,
+        max_workers: int = 16,
+        max_attempts: int = 6,
+        retry_budget: int = 200,
+        base_delay: float = 1.0,
+        max_delay: float = 64.0,
+    ):
+        self.upload_fn = upload_fn
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.limit = min(max(start_workers, self.min_workers), self.max_workers)
+        self.max_attempts = max_attempts
+        self.retry_budget = retry_budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.peak_limit = self.limit
+        self.succeeded = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttles = 0
+
+        self._latency_ewma = None
+        self._latency_baseline = None
+        self._latency_samples = 0
+        self._clean_streak = 0
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _set_limit(self, value: int):
+        self.limit = min(max(value, self.min_workers), self.max_workers)
+        self.peak_limit = max(self.peak_limit, self.limit)
+        self._clean_streak = 0
+
+    def _observe_success(self, latency: float):
+        self._latency_samples += 1
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * latency
+
+        if self._latency_samples >= 5:
+            if self._latency_baseline is None or self._latency_ewma < self._latency_baseline:
+                self._latency_baseline = self._latency_ewma
+
+        self._clean_streak += 1
+        if self._latency_baseline is None:
+            return
+        if self._latency_ewma > 2.0 * self._latency_baseline:
+            self._set_limit(self.limit - 1)  # queueing somewhere: back off a step
+        elif self._clean_streak >= self.limit and self._latency_ewma <= 1.5 * self._latency_baseline:
+            self._set_limit(self.limit + 1)
+
+    def stats(self) -> dict:
+        return {
+            "finalConcurrency": self.limit,
+            "peakConcurrency": self.peak_limit,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retries": self.retries,
+            "throttled": self.throttles,
+            "latencyEwmaMs": round(1000 * self._latency_ewma, 1) if self._latency_ewma is not None else None,
+        }
+
+    def run(self, items, on_result, on_retry=None):
+        if isinstance(items, queue.Queue):
+            source = items
+        else:
+            source = queue.Queue()
+            for item in items:
+                source.put(item)
+            source.put(None)
+        source_done = False
+        retry_heap = []  # (ready_at, seq, item, attempt)
+        seq = itertools.count()
+        in_flight = {}  # future -> (item, attempt, started_at)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            while True:
+                now = time.monotonic()
+                while len(in_flight) < self.limit:
+                    if retry_heap and retry_heap[0][0] <= now:
+                        _, _, item, attempt = heapq.heappop(retry_heap)
+                    elif not source_done:
+                        # Only block on the source when there is nothing else to wait for
+                        if in_flight:
+                            get_timeout = 0
+                        elif retry_heap:
+                            get_timeout = max(0.0, retry_heap[0][0] - now)
+                        else:
+                            get_timeout = None
+                        try:
+                            item, attempt = source.get(timeout=get_timeout), 0
+                        except queue.Empty:
+                            break
+                        if item is None:
+                            source_done = True
+                            continue
+                    else:
+                        break
+                    in_flight[ex.submit(self.upload_fn, item)] = (item, attempt, time.monotonic())
+
+                if not in_flight and not retry_heap and source_done:
+                    break
+
+                timeout = max(0.0, retry_heap[0][0] - now) if retry_heap else None
+                if not in_flight:
+                    if source_done:
+                        time.sleep(timeout or 0)
+                    continue
+                if not source_done:
+                    timeout = QUEUE_POLL_SECONDS if timeout is None else min(timeout, QUEUE_POLL_SECONDS)
+
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    item, attempt, started = in_flight.pop(fut)
+                    try:
+                        result = fut.result()
+                    except Exception as e:
+                        kind = classify_error(e)
+                        if kind == "throttle":
+                            self.throttles += 1
+                            self._set_limit(self.limit // 2)
+                        can_retry = kind != "fatal" and attempt + 1 < self.max_attempts and self.retry_budget > 0
+                        if can_retry:
+                            self.retry_budget -= 1
+                            self.retries += 1
+                            delay = self._backoff(attempt + 1)
+                            heapq.heappush(retry_heap, (time.monotonic() + delay, next(seq), item, attempt + 1))
+                            if on_retry:
+                                on_retry(item, attempt + 1, delay, e)
+                            continue
+                        self.failed += 1
+                        on_result(item, None, e)
+                        continue
+
+                    self.succeeded += 1
+                    self._observe_success(time.monotonic() - started)
+                    on_result(item, result, None)
@@ -0,0 +1,131 @@
+import posixpath
+import xml.etree.ElementTree as ET
+
+
+NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+    "xdr": "http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing",
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+}
+
+DRAWING_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/drawing"
+IMAGE_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+ANCHOR_TAGS = (f"{{{NS['xdr']}}}twoCellAnchor", f"{{{NS['xdr']}}}oneCellAnchor")
+
+
+def _rels_path(part_path: str) -> str:
+    folder, name = posixpath.split(part_path)
+    return posixpath.join(folder, "_rels", f"{name}.rels")
+
+
+def _read_rels(zf, part_path: str) -> dict:
+    """Return {rId: (type, absolute target path)} for a part. Missing rels -> {}."""
+    rels_path = _rels_path(part_path)
+    if rels_path not in zf.namelist():
+        return {}
+
+    base = posixpath.dirname(part_path)
+    rels = {}
+    root = ET.fromstring(zf.read(rels_path))
+    for rel in root.findall("rel:Relationship", NS):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            path = target.lstrip("/")
+        else:
+            path = posixpath.normpath(posixpath.join(base, target))
+        rels[rel.get("Id")] = (rel.get("Type"), path)
+    return rels
+
+
+def resolve_sheet_path(zf, sheet_name: str = None):
+    """
+    Find the worksheet part for sheet_name (first sheet if None).
+    Returns (sheet_title, part_path), e.g. ("18.2.2026", "xl/worksheets/sheet1.xml").
+    """
+    wb_path = "xl/workbook.xml"
+    wb_rels = _read_rels(zf, wb_path)
+    root = ET.fromstring(zf.read(wb_path))
+
+    sheets = root.findall("main:sheets/main:sheet", NS)
+    if not sheets:
+        raise RuntimeError("❌ Workbook has no sheets.")
+
+    for sheet in sheets:
+        title = sheet.get("name")
+        if sheet_name is None or title == sheet_name:
+            rid = sheet.get(f"{{{NS['r']}}}id")
+            return title, wb_rels[rid][1]
+
+    raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+
+def find_image_anchors(zf, sheet_path: str) -> list:
+    """
+    Map every picture anchored on the sheet to its media part.
+    Returns [(row, col, media_path)] with 1-based row/col (top-left cell of the anchor).
+    Only xml is parsed here; no image bytes are read.
+    """
+    anchors = []
+    for rel_type, drawing_path in _read_rels(zf, sheet_path).values():
+        if rel_type != DRAWING_REL_TYPE:
+            continue
+
+        drawing_rels = _read_rels(zf, drawing_path)
+        root = ET.fromstring(zf.read(drawing_path))
+
+        for anchor in root:
+            if anchor.tag not in ANCHOR_TAGS:
+                continue  # absoluteAnchor has no cell position
+
+            frm = anchor.find("xdr:from", NS)
+            blip = anchor.find(".//a:blip", NS)
+            if frm is None or blip is None:
+                continue
+
+            rel = drawing_rels.get(blip.get(f"{{{NS['r']}}}embed"))
+            if not rel or rel[0] != IMAGE_REL_TYPE:
+                continue
+
+            row = int(frm.findtext("xdr:row", "0", NS)) + 1
+            col = int(frm.findtext("xdr:col", "0", NS)) + 1
+            anchors.append((row, col, rel[1]))
+
+    return anchors
+
+
+def media_ext(media_path: str) -> str:
+    ext = posixpath.splitext(media_path)[1].lstrip(".").lower() or "jpg"
+    return "jpg" if ext == "jpeg" else ext
+
+
+def column_media_by_row(anchors: list, image_col: int, rows=None) -> dict:
+    """
+    {row: media_path} for the anchors (see find_image_anchors) in image_col.
+    If rows is given, other rows are ignored. When several images share a cell,
+    the last one wins.
+    """
+    media_by_row = {}
+    for row, col, media_path in anchors:
+        if col != image_col:
+            continue
+        if rows is not None and row not in rows:
+            continue
+        media_by_row[row] = media_path
+    return media_by_row
+
+
+def media_signature(zf, media_path: str) -> str:
+    """Cheap content fingerprint from the zip directory (crc32 + size), no decompression."""
+    info = zf.getinfo(media_path)
+    return f"{info.CRC:08x}-{info.file_size}"
+
+
+def read_media(zf, media_path: str) -> bytes:
+    """Decompress one media entry."""
+    with zf.open(media_path) as fh:
+        return fh.read()